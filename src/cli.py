@@ -4,8 +4,6 @@ CLI Module — Typer-based command-line interface.
 
 from __future__ import annotations
 
-import json
-from pathlib import Path
 from typing import Optional
 
 import typer
@@ -59,6 +57,7 @@ def test_prompt(
 ) -> None:
     """Test the moderation prompt by sending a message to the LLM (no Telegram needed)."""
     import asyncio
+    import json
     from src.config import load_config
     from src.llm.client import LLMClient
     from src.llm.prompts import ModerationPromptBuilder
@@ -94,10 +93,13 @@ def test_prompt(
         typer.echo(f"\n📥 Raw response:\n{response.content}")
         typer.echo(f"\n📊 Tokens: {response.total_tokens}")
 
-        # Try parsing
-        from src.moderation.engine import ModerationEngine
-        verdict = ModerationEngine._parse_verdict(response.content)
-        typer.echo(f"\n⚖️ Parsed verdict:\n{json.dumps(verdict, indent=2, ensure_ascii=False)}")
+        # Try parsing (a response without any JSON can't yield a verdict)
+        if "{" not in response.content and "[" not in response.content:
+            typer.echo("\n⚠️ Non-JSON response, skipping verdict parsing.", err=True)
+        else:
+            from src.moderation.engine import ModerationEngine
+            verdict = ModerationEngine._parse_verdict(response.content)
+            typer.echo(f"\n⚖️ Parsed verdict:\n{json.dumps(verdict, indent=2, ensure_ascii=False)}")
 
         await llm.close()
 
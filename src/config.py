@@ -8,13 +8,56 @@ Adapted from llm-interviewer/src/config.py.
 from __future__ import annotations
 
 import os
+import re
 from pathlib import Path
-from typing import Literal, Optional
+from typing import Any, Literal, Optional
 
 import yaml
-from pydantic import BaseModel, Field, SecretStr, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, SecretStr, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
+# Latest parsed config per (resolved path, trusted), with the (mtime_ns, size)
+# it was parsed from; an edited file replaces its entry instead of adding one
+_CFG_CACHE: dict[tuple[str, bool], tuple[int, int, "AppConfig"]] = {}
+
+# Set to "1" to have `moderator run` build its config without validation
+# (YAML already validated, e.g. at container build time via
+# `moderator check-config`). Other commands always validate.
+TRUST_CONFIG_ENV = "MODERATOR_TRUST_CONFIG"
+
+
+def compile_regex_union(patterns: list[str]) -> Optional[re.Pattern]:
+    """
+    Compile patterns into a single case-insensitive alternation.
+
+    Each valid pattern is wrapped in a named group `_p<i>`, where i is its
+    position among the valid patterns, so `match.lastgroup` tells which one
+    fired. Invalid patterns are dropped. Returns None when nothing is left,
+    or when the patterns can't be combined (e.g. numbered backreferences or
+    inline global flags), in which case callers should test them one by one.
+    """
+    valid = []
+    for pattern in patterns:
+        try:
+            re.compile(pattern)
+        except re.error:
+            continue
+        valid.append(pattern)
+    if not valid:
+        return None
+    try:
+        return re.compile(
+            "|".join(f"(?P<_p{i}>{p})" for i, p in enumerate(valid)),
+            re.IGNORECASE,
+        )
+    except re.error:
+        return None
+
 
 class TelegramConfig(BaseModel):
     """Telegram API configuration."""
@@ -53,6 +96,10 @@ class ModerationConfig(BaseModel):
         default=False,
         description="Dry run mode: only forward to review group, no actions in main chat",
     )
+    ignored_sender_ids: list[int] = Field(
+        default_factory=list,
+        description="Sender IDs (bots, service accounts) whose messages are never evaluated",
+    )
     hard_ban_keywords: list[str] = Field(
         default_factory=list,
         description="Keywords that trigger instant action (no LLM call)",
@@ -61,10 +108,18 @@ class ModerationConfig(BaseModel):
         default_factory=list,
         description="Regex patterns that trigger instant action",
     )
+    prefilter_max_chars: int = Field(
+        default=8192, ge=0,
+        description="Only the first N chars of a message are pre-filtered (0 = no cap)",
+    )
     user_cooldown_seconds: int = Field(
         default=60, ge=0, le=3600,
         description="Cooldown between moderation actions on same user",
     )
+    user_state_max_entries: int = Field(
+        default=100_000, ge=100,
+        description="Max users whose cooldown/warning state is kept (least recently seen evicted)",
+    )
     context_window_messages: int = Field(
         default=15, ge=0, le=100,
         description="Recent messages to include as LLM context",
@@ -85,6 +140,26 @@ class ModerationConfig(BaseModel):
         default=3000, ge=500, le=30000,
         description="Max estimated tokens before auto-flushing batch queue",
     )
+    hedge_delay_seconds: float = Field(
+        default=0.0, ge=0,
+        description="Also ask OpenRouter if the local LLM hasn't answered a newcomer "
+        "message after N seconds (0 = never; spends OpenRouter quota)",
+    )
+    max_concurrent_actions: int = Field(
+        default=5, ge=1, le=50,
+        description="Max batch verdicts applied (Telegram API calls) at once",
+    )
+
+    # Derived at load time; PreFilter reuses it instead of recompiling
+    _hard_ban_union: Optional[re.Pattern] = PrivateAttr(default=None)
+
+    def model_post_init(self, __context: Any) -> None:
+        self._hard_ban_union = compile_regex_union(self.hard_ban_regex)
+
+    @property
+    def hard_ban_union(self) -> Optional[re.Pattern]:
+        """All hard-ban regex patterns as one case-insensitive alternation."""
+        return self._hard_ban_union
 
 
 class QuotaConfig(BaseModel):
@@ -149,14 +224,58 @@ class AppConfig(BaseSettings):
     logging: LoggingConfig = Field(default_factory=LoggingConfig)
 
     @classmethod
-    def from_yaml(cls, path: str | Path) -> "AppConfig":
-        """Load configuration from YAML file."""
+    def from_yaml(cls, path: str | Path, trusted: bool = False) -> "AppConfig":
+        """
+        Load configuration from YAML file.
+
+        The latest result per path is cached with the file's mtime and
+        size, so repeated loads of an unchanged file skip parsing and
+        validation.
+
+        Args:
+            path: YAML file path.
+            trusted: Skip validation (see from_yaml_fast).
+        """
         path = Path(path)
         if not path.exists():
             raise FileNotFoundError(f"Config file not found: {path}")
-        with open(path, "r", encoding="utf-8") as f:
-            data = yaml.safe_load(f)
-        return cls(**data)
+        st = path.stat()
+        key = (str(path.resolve()), trusted)
+        cached = _CFG_CACHE.get(key)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return cached[2]
+
+        # libyaml parses a contiguous buffer much faster than a text stream
+        data = yaml.load(path.read_bytes(), Loader=_YamlLoader)
+        config = cls._construct_trusted(data) if trusted else cls(**data)
+        _CFG_CACHE[key] = (st.st_mtime_ns, st.st_size, config)
+        return config
+
+    @classmethod
+    def from_yaml_fast(cls, path: str | Path) -> "AppConfig":
+        """
+        Load a pre-validated YAML file without running validators.
+
+        Only use this for files already checked with `moderator check-config`:
+        no type coercion, constraint checks or env overrides are applied.
+        """
+        return cls.from_yaml(path, trusted=True)
+
+    @classmethod
+    def _construct_trusted(cls, data: dict) -> "AppConfig":
+        """Build the config tree via model_construct, section by section."""
+        sections = {}
+        for name, field in cls.model_fields.items():
+            if name not in data:
+                continue
+            section_cls = field.annotation
+            values = dict(data[name] or {})
+            # SecretStr is the one field type callers rely on being wrapped
+            for sub_name, sub_field in section_cls.model_fields.items():
+                if sub_field.annotation is SecretStr and sub_name in values:
+                    values[sub_name] = SecretStr(str(values[sub_name]))
+            sections[name] = section_cls.model_construct(**values)
+        return cls.model_construct(**sections)
 
     @model_validator(mode="after")
     def check_placeholders(self) -> "AppConfig":
@@ -184,14 +303,15 @@ class AppConfig(BaseSettings):
         return self
 
 
-def load_config(path: Optional[str | Path] = None) -> AppConfig:
+def load_config(path: Optional[str | Path] = None, trusted: bool = False) -> AppConfig:
     """
     Load configuration from file or environment.
 
     Tries: explicit path → config/config.yaml → config.yaml → env vars.
+    `trusted` skips validation of a YAML file (see AppConfig.from_yaml_fast).
     """
     if path:
-        return AppConfig.from_yaml(path)
+        return AppConfig.from_yaml(path, trusted=trusted)
 
     default_paths = [
         Path("config/config.yaml"),
@@ -199,7 +319,7 @@ def load_config(path: Optional[str | Path] = None) -> AppConfig:
     ]
     for p in default_paths:
         if p.exists():
-            return AppConfig.from_yaml(p)
+            return AppConfig.from_yaml(p, trusted=trusted)
 
     # Fall back to environment
     return AppConfig(
@@ -209,3 +329,6 @@ def load_config(path: Optional[str | Path] = None) -> AppConfig:
             phone=os.environ["MODERATOR_TELEGRAM__PHONE"],
         ),
     )
+
+
+load_config.cache_clear = _CFG_CACHE.clear
@@ -0,0 +1,42 @@
+"""
+JSON helpers.
+
+Uses orjson (C extension) when installed and falls back to the stdlib
+json module otherwise. Output is always compact UTF-8 with non-ASCII
+characters left unescaped, matching ``json.dumps(..., ensure_ascii=False)``.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # optional speedup, see the "speedups" extra
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+# catch this regardless of which backend is active.
+JSONDecodeError = json.JSONDecodeError
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to UTF-8 encoded JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_str(obj: Any) -> str:
+    """Serialize to a JSON string."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(data: bytes | bytearray | str) -> Any:
+    """Deserialize JSON from bytes or str."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -9,46 +9,60 @@ falls back to local on rate-limit (429) or connection errors.
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import logging
-from dataclasses import dataclass, field
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
 from typing import Optional, List, Dict, Literal
 from enum import Enum
 
 import httpx
 
+from src import jsonutil
+
 logger = logging.getLogger(__name__)
 
 
 class MessageRole(Enum):
-    """Chat message roles."""
+    """Chat message roles (kept for API compatibility; wire format uses plain strings)."""
     SYSTEM = "system"
     USER = "user"
     ASSISTANT = "assistant"
 
 
-@dataclass
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Log the response cache hit rate once per this many cache lookups
+_CACHE_STATS_EVERY = 500
+
+# Wire format for chat messages: {"role": ..., "content": ...}
+ChatMessage = Dict[str, str]
+
+
+@dataclass(slots=True, frozen=True)
 class Message:
-    """Chat message."""
-    role: MessageRole
+    """Chat message builder. Endpoints consume the plain-dict form."""
+    role: str
     content: str
 
-    def to_dict(self) -> Dict[str, str]:
-        return {"role": self.role.value, "content": self.content}
+    def to_dict(self) -> ChatMessage:
+        return {"role": self.role, "content": self.content}
 
-    @classmethod
-    def system(cls, content: str) -> "Message":
-        return cls(MessageRole.SYSTEM, content)
+    @staticmethod
+    def system(content: str) -> ChatMessage:
+        return {"role": "system", "content": content}
 
-    @classmethod
-    def user(cls, content: str) -> "Message":
-        return cls(MessageRole.USER, content)
+    @staticmethod
+    def user(content: str) -> ChatMessage:
+        return {"role": "user", "content": content}
 
-    @classmethod
-    def assistant(cls, content: str) -> "Message":
-        return cls(MessageRole.ASSISTANT, content)
+    @staticmethod
+    def assistant(content: str) -> ChatMessage:
+        return {"role": "assistant", "content": content}
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ChatResponse:
     """LLM chat response."""
     content: str
@@ -70,6 +84,7 @@ class _Endpoint:
         name: str,
         base_url: str,
         model: str,
+        client: httpx.AsyncClient,
         api_key: str = "",
         max_tokens: int = 500,
         temperature: float = 0.1,
@@ -77,34 +92,62 @@ class _Endpoint:
         self.name = name
         self.base_url = base_url
         self.model = model
+        self.client = client
         self.api_key = api_key
         self.max_tokens = max_tokens
         self.temperature = temperature
 
-        headers = {}
+        # The HTTP client is shared between endpoints, so auth goes per request
+        headers = dict(_JSON_HEADERS)
         if api_key:
             headers["Authorization"] = f"Bearer {api_key}"
             headers["HTTP-Referer"] = "https://github.com/tg-chat-moderator"
             headers["X-Title"] = "tg-chat-moderator"
+        self._headers = headers
+
+        # model/temperature are fixed per endpoint: pre-encode them once as an
+        # open JSON object and only append max_tokens + messages per request.
+        self._payload_prefix = jsonutil.dumps(
+            {"model": model, "temperature": temperature}
+        )[:-1]
+        self.url = f"{base_url}/chat/completions"
+
+        # Warm-up request body, rebuilt only when the system prompt changes
+        self._warmup_prompt: Optional[str] = None
+        self._warmup_bytes = b""
+
+    def _build_body(self, messages: List[ChatMessage], max_tokens: Optional[int] = None) -> bytes:
+        """Serialize a chat completion request body."""
+        return b"".join((
+            self._payload_prefix,
+            b',"max_tokens":',
+            str(max_tokens or self.max_tokens).encode(),
+            b',"messages":',
+            jsonutil.dumps(messages),
+            b"}",
+        ))
+
+    def _warmup_body(self, system_prompt: str) -> bytes:
+        """Serialized warm-up request for the given system prompt."""
+        if system_prompt is not self._warmup_prompt:
+            self._warmup_prompt = system_prompt
+            self._warmup_bytes = jsonutil.dumps({
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": '{"message":"ping","sender":{"name":"system","username":"","id":0},"context":[],"warnings_count":0}'},
+                ],
+                "max_tokens": 100,  # Small response for warm-up
+                "temperature": 0.1,
+            })
+        return self._warmup_bytes
 
-        self.client = httpx.AsyncClient(
-            headers=headers,
-            timeout=httpx.Timeout(10.0, read=60.0),
-            follow_redirects=True,
-        )
-
-    async def chat(self, messages: List[Message], max_tokens: Optional[int] = None) -> ChatResponse:
+    async def chat(self, messages: List[ChatMessage], max_tokens: Optional[int] = None) -> ChatResponse:
         """Send request to this endpoint. Raises on failure."""
-        payload = {
-            "model": self.model,
-            "messages": [m.to_dict() for m in messages],
-            "max_tokens": max_tokens or self.max_tokens,
-            "temperature": self.temperature,
-        }
-
         response = await self.client.post(
-            f"{self.base_url}/chat/completions",
-            json=payload,
+            self.url,
+            content=self._build_body(messages, max_tokens),
+            headers=self._headers,
         )
 
         if response.status_code == 400:
@@ -119,7 +162,7 @@ class _Endpoint:
             raise RateLimitError(f"{self.name}: 429 Too Many Requests")
 
         response.raise_for_status()
-        data = response.json()
+        data = jsonutil.loads(response.content)
 
         choice = data["choices"][0]
         return ChatResponse(
@@ -139,18 +182,10 @@ class _Endpoint:
         """
         try:
             logger.info(f"Warming up {self.name} with system prompt...")
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": '{"message":"ping","sender":{"name":"system","username":"","id":0},"context":[],"warnings_count":0}'},
-                ],
-                "max_tokens": 100,  # Small response for warm-up
-                "temperature": 0.1,
-            }
             response = await self.client.post(
-                f"{self.base_url}/chat/completions",
-                json=payload,
+                self.url,
+                content=self._warmup_body(system_prompt),
+                headers=self._headers,
             )
             if response.status_code == 200:
                 logger.info(f"✅ {self.name} warmed up (system prompt cached)")
@@ -162,9 +197,6 @@ class _Endpoint:
             logger.warning(f"Warm-up failed for {self.name}: {e}")
             return False
 
-    async def close(self):
-        await self.client.aclose()
-
 
 class RateLimitError(Exception):
     pass
@@ -191,10 +223,51 @@ class LLMClient:
         max_tokens: int = 500,
         temperature: float = 0.1,
         max_retries: int = 2,
+        cache_size: int = 2000,
     ):
+        if provider not in ("openrouter", "local", "both"):
+            raise ValueError(f"Unknown provider: {provider}")
+
         self.provider = provider
         self.max_retries = max_retries
 
+        # One pooled HTTP client shared by all endpoints. HTTP/2 lets concurrent
+        # moderations multiplex over a single TLS connection to OpenRouter.
+        local_only = provider == "local" and httpx.URL(endpoint).host in (
+            "127.0.0.1", "localhost", "::1",
+        )
+        self._http = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, read=60.0),
+            follow_redirects=True,
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(
+                    max_keepalive_connections=16,
+                    max_connections=32,
+                    keepalive_expiry=60.0,
+                ),
+                retries=0,
+            ),
+            # Skip proxy env lookups when only talking to a local server
+            trust_env=not local_only,
+        )
+
+        # LRU of responses keyed by a hash of the request. Moderation traffic
+        # repeats a lot (greetings, emoji, spam templates), and with a low
+        # temperature the verdict is effectively a pure function of the input.
+        self._cache_enabled = cache_size > 0 and temperature <= 0.2
+        self._cache_size = cache_size
+        self._response_cache: OrderedDict[bytes, ChatResponse] = OrderedDict()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        # Digest of the (multi-KB, rarely changing) system prompt, keyed by identity
+        self._system_prompt: Optional[str] = None
+        self._system_digest = b""
+
+        # time.monotonic() of the last successful local inference; a recent one
+        # means the system prompt is still hot in the local KV-cache
+        self.last_local_inference: float = 0.0
+
         # Build endpoint list
         self._endpoints: list[_Endpoint] = []
 
@@ -203,6 +276,7 @@ class LLMClient:
                 name="openrouter",
                 base_url=self.OPENROUTER_BASE,
                 model=model,
+                client=self._http,
                 api_key=api_key,
                 max_tokens=max_tokens,
                 temperature=temperature,
@@ -213,25 +287,81 @@ class LLMClient:
                 name="local",
                 base_url=endpoint,
                 model=local_model,
+                client=self._http,
                 max_tokens=max_tokens,
                 temperature=temperature,
             ))
 
-        if not self._endpoints:
-            raise ValueError(f"Unknown provider: {provider}")
+        self._by_name: dict[str, _Endpoint] = {e.name: e for e in self._endpoints}
 
         logger.info(
             f"LLM client initialized: provider={provider}, "
             f"endpoints={[e.name for e in self._endpoints]}"
         )
 
-    async def chat(self, messages: List[Message], max_tokens: Optional[int] = None) -> ChatResponse:
+    def _cache_key(self, messages: List[ChatMessage], max_tokens: Optional[int]) -> bytes:
+        """Hash of the request: system prompt digest plus the other turns."""
+        h = hashlib.blake2b(digest_size=16)
+        for m in messages:
+            content = m["content"]
+            if m["role"] == "system":
+                if content is not self._system_prompt:
+                    self._system_prompt = content
+                    self._system_digest = hashlib.blake2b(
+                        content.encode(), digest_size=16
+                    ).digest()
+                h.update(b"s")
+                h.update(self._system_digest)
+            else:
+                data = content.encode()
+                # Length-prefixed so turn boundaries can't collide
+                h.update(f"{m['role']}:{len(data)}:".encode())
+                h.update(data)
+        h.update(str(max_tokens).encode())
+        return h.digest()
+
+    def _cache_get(self, key: bytes) -> Optional[ChatResponse]:
+        cached = self._response_cache.get(key)
+        lookups = self._cache_hits + self._cache_misses + 1
+        if lookups % _CACHE_STATS_EVERY == 0:
+            logger.info(
+                f"LLM response cache: {self.cache_hit_rate:.1%} hit rate "
+                f"over {lookups - 1} lookups, {len(self._response_cache)} entries"
+            )
+        if cached is None:
+            self._cache_misses += 1
+            return None
+        self._cache_hits += 1
+        self._response_cache.move_to_end(key)
+        return replace(cached, provider_used="cache")
+
+    def _cache_put(self, key: bytes, response: ChatResponse) -> None:
+        self._response_cache[key] = response
+        self._response_cache.move_to_end(key)
+        while len(self._response_cache) > self._cache_size:
+            self._response_cache.popitem(last=False)
+
+    @property
+    def cache_hit_rate(self) -> float:
+        """Fraction of cacheable requests served from the response cache."""
+        total = self._cache_hits + self._cache_misses
+        return self._cache_hits / total if total else 0.0
+
+    async def chat(self, messages: List[ChatMessage], max_tokens: Optional[int] = None) -> ChatResponse:
         """
         Send chat completion request with failover.
 
         Tries each endpoint in order. On rate-limit or connection error,
         falls back to the next endpoint.
         """
+        key = None
+        if self._cache_enabled:
+            key = self._cache_key(messages, max_tokens)
+            cached = self._cache_get(key)
+            if cached is not None:
+                logger.debug("LLM [cache]: hit")
+                return cached
+
         last_error = None
 
         for ep in self._endpoints:
@@ -243,6 +373,10 @@ class LLMClient:
                         f"LLM [{ep.name}]: {len(response.content)} chars, "
                         f"{response.total_tokens} tokens"
                     )
+                    if ep.name == "local":
+                        self.last_local_inference = time.monotonic()
+                    if key is not None:
+                        self._cache_put(key, response)
                     return response
 
                 except RateLimitError as e:
@@ -264,7 +398,7 @@ class LLMClient:
                     # For local LLMs, a 400 "Channel Error" or context issue might be resolved by a re-warmup or retry
                     if ep.name == "local" and e.response.status_code == 400:
                         logger.warning(f"Local LLM returned 400 (context/channel error). Attempting re-warmup...")
-                        await ep.warm_up(messages[0].content if messages and messages[0].role == MessageRole.SYSTEM else "")
+                        await ep.warm_up(messages[0]["content"] if messages and messages[0]["role"] == "system" else "")
                         await asyncio.sleep(2)
                         if attempt < self.max_retries - 1:
                             continue
@@ -284,7 +418,7 @@ class LLMClient:
             f"All LLM endpoints failed after exhausting retries: {last_error}"
         )
 
-    async def chat_local(self, messages: List[Message], max_tokens: int = 1000) -> ChatResponse:
+    async def chat_local(self, messages: List[ChatMessage], max_tokens: int = 1000) -> ChatResponse:
         """
         Send request directly to local endpoint only (for newcomer fast-path).
         Defaults to a lower max_tokens (1000) to avoid context overflow.
@@ -292,9 +426,22 @@ class LLMClient:
         ep = self._get_endpoint("local")
         if not ep:
             raise RuntimeError("No local endpoint configured")
-        return await ep.chat(messages, max_tokens=max_tokens)
 
-    async def chat_openrouter(self, messages: List[Message], max_tokens: Optional[int] = None) -> ChatResponse:
+        key = None
+        if self._cache_enabled:
+            key = self._cache_key(messages, max_tokens)
+            cached = self._cache_get(key)
+            if cached is not None:
+                logger.debug("LLM [cache]: hit")
+                return cached
+
+        response = await ep.chat(messages, max_tokens=max_tokens)
+        self.last_local_inference = time.monotonic()
+        if key is not None:
+            self._cache_put(key, response)
+        return response
+
+    async def chat_openrouter(self, messages: List[ChatMessage], max_tokens: Optional[int] = None) -> ChatResponse:
         """Send request directly to OpenRouter only (for batch flush)."""
         ep = self._get_endpoint("openrouter")
         if not ep:
@@ -309,18 +456,15 @@ class LLMClient:
 
     def _get_endpoint(self, name: str) -> Optional[_Endpoint]:
         """Get endpoint by name."""
-        for ep in self._endpoints:
-            if ep.name == name:
-                return ep
-        return None
+        return self._by_name.get(name)
 
     @property
     def has_local(self) -> bool:
-        return self._get_endpoint("local") is not None
+        return "local" in self._by_name
 
     @property
     def has_openrouter(self) -> bool:
-        return self._get_endpoint("openrouter") is not None
+        return "openrouter" in self._by_name
 
     async def warm_up_local(self, system_prompt: str) -> bool:
         """Warm up local LLM with system prompt."""
@@ -330,8 +474,7 @@ class LLMClient:
         return False
 
     async def close(self) -> None:
-        for ep in self._endpoints:
-            await ep.close()
+        await self._http.aclose()
 
     async def __aenter__(self):
         return self
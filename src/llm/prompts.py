@@ -7,34 +7,18 @@ with message context for moderation verdicts.
 
 from __future__ import annotations
 
-import json
 import logging
 import hashlib
 import time
-from collections import deque
-from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List
 
-from src.llm.client import Message
+from src import jsonutil
+from src.llm.client import ChatMessage, Message
 
 logger = logging.getLogger(__name__)
 
 
-@dataclass
-class MessageContext:
-    """A single message in the group conversation context."""
-    sender_name: str
-    sender_username: Optional[str]
-    text: str
-
-    def to_dict(self) -> Dict[str, str]:
-        return {
-            "sender": self.sender_name + (f" (@{self.sender_username})" if self.sender_username else ""),
-            "text": self.text,
-        }
-
-
 class ModerationPromptBuilder:
     """
     Builds moderation prompts for the LLM.
@@ -51,17 +35,37 @@ class ModerationPromptBuilder:
         self.system_prompt_path = Path(system_prompt_path)
         self.context_window = context_window
         self._system_prompt: Optional[str] = None
-        self._context_buffer: deque[MessageContext] = deque(maxlen=context_window)
+        self._system_message: Optional[ChatMessage] = None
+        self._prompt_mtime_ns: int = -1
+        # Context window as a fixed-size ring of pre-serialized JSON objects,
+        # each {"sender": "Name (@username)", "text": "..."} (the "(@username)"
+        # suffix only when there is one); _ring_pos is the next slot.
+        self._ring: list[Optional[bytes]] = [None] * max(0, context_window)
+        self._ring_pos = 0
         # Unique session ID to bust KV caches (like LM Studio) on every bot restart
         self._session_id = str(int(time.time()))
 
     def load_system_prompt(self) -> str:
-        """Load system prompt from markdown file."""
-        if not self.system_prompt_path.exists():
+        """Load system prompt from markdown file (no-op if unchanged on disk)."""
+        try:
+            st = self.system_prompt_path.stat()
+        except FileNotFoundError:
             raise FileNotFoundError(
                 f"System prompt not found: {self.system_prompt_path}"
-            )
-        self._system_prompt = self.system_prompt_path.read_text(encoding="utf-8")
+            ) from None
+        if st.st_mtime_ns == self._prompt_mtime_ns and self._system_prompt is not None:
+            return self._system_prompt
+
+        self._system_prompt = self.system_prompt_path.read_bytes().decode("utf-8")
+        self._prompt_mtime_ns = st.st_mtime_ns
+
+        # Add a version hash to the system prompt to bust LLM KV caches (like LM Studio).
+        # We include a session ID to ensure a fresh cache even if the prompt file hasn't changed.
+        # The result is constant until the next reload, so build the wire dict once.
+        prompt_hash = hashlib.md5(f"{self._system_prompt}-{self._session_id}".encode("utf-8")).hexdigest()[:8]
+        self._system_message = Message.system(
+            f"{self._system_prompt}\n\n[Session: {self._session_id}, Hash: {prompt_hash}]"
+        )
         logger.info(
             f"Loaded system prompt from {self.system_prompt_path} "
             f"({len(self._system_prompt)} chars)"
@@ -86,13 +90,19 @@ class ModerationPromptBuilder:
         text: str,
     ) -> None:
         """Add a message to the context window (sliding buffer)."""
-        self._context_buffer.append(
-            MessageContext(
-                sender_name=sender_name,
-                sender_username=sender_username,
-                text=text,
-            )
-        )
+        if not self._ring:
+            return
+        self._ring[self._ring_pos] = jsonutil.dumps({
+            "sender": sender_name + (f" (@{sender_username})" if sender_username else ""),
+            "text": text,
+        })
+        self._ring_pos = (self._ring_pos + 1) % len(self._ring)
+
+    def _serialized_context(self) -> bytes:
+        """JSON array of the context window, oldest message first."""
+        pos = self._ring_pos
+        ordered = self._ring[pos:] + self._ring[:pos]
+        return b"[" + b",".join(f for f in ordered if f is not None) + b"]"
 
     def build_messages(
         self,
@@ -102,7 +112,7 @@ class ModerationPromptBuilder:
         sender_id: Optional[int] = None,
         warnings_count: int = 0,
         include_context: bool = True,
-    ) -> List[Message]:
+    ) -> List[ChatMessage]:
         """
         Build the message list for an LLM moderation request.
 
@@ -114,33 +124,54 @@ class ModerationPromptBuilder:
             warnings_count: Prior warning count for this user.
 
         Returns:
-            List of Message objects ready for LLM.
+            List of message dicts ready for LLM.
         """
         if not self._system_prompt:
             self.load_system_prompt()
 
-        # Build the user payload
-        user_payload = {
+        # Build the user payload. The context array is spliced in from its
+        # cached serialization rather than re-encoded on every request.
+        head = jsonutil.dumps({
             "message": message_text,
             "sender": {
                 "name": sender_name,
                 "username": sender_username or "",
                 "id": sender_id or 0,
             },
-            "context": [m.to_dict() for m in self._context_buffer] if include_context else [],
-            "warnings_count": warnings_count,
-        }
-
-        # Add a version hash to the system prompt to bust LLM KV caches (like LM Studio).
-        # We include a session ID to ensure a fresh cache even if the prompt file hasn't changed.
-        prompt_hash = hashlib.md5(f"{self._system_prompt}-{self._session_id}".encode("utf-8")).hexdigest()[:8]
-        system_content = f"{self._system_prompt}\n\n[Session: {self._session_id}, Hash: {prompt_hash}]"
+        })[:-1]
+        user_payload = b"".join((
+            head,
+            b',"context":',
+            self._serialized_context() if include_context else b"[]",
+            b',"warnings_count":',
+            str(warnings_count).encode(),
+            b"}",
+        ))
 
         return [
-            Message.system(system_content),
-            Message.user(json.dumps(user_payload, ensure_ascii=False)),
+            self._system_message,
+            Message.user(user_payload.decode("utf-8")),
         ]
 
+    @staticmethod
+    def strip_context(messages: List[ChatMessage]) -> List[ChatMessage]:
+        """
+        Copy of a build_messages() result with the context array emptied.
+
+        Cuts the already-encoded payload instead of rebuilding it. Inside
+        JSON strings quotes are escaped, so the only literal `,"context":`
+        and `,"warnings_count":` are the payload's own keys.
+        """
+        content = messages[-1]["content"]
+        start = content.find(',"context":')
+        end = content.rfind(',"warnings_count":')
+        if start == -1 or end < start:
+            return messages
+        trimmed = messages[:]
+        trimmed[-1] = Message.user(content[:start] + ',"context":[]' + content[end:])
+        return trimmed
+
     def clear_context(self) -> None:
         """Clear the context buffer."""
-        self._context_buffer.clear()
+        self._ring = [None] * len(self._ring)
+        self._ring_pos = 0
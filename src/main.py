@@ -9,11 +9,22 @@ moderation engine, and gateway.
 from __future__ import annotations
 
 import asyncio
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
+import time
 from pathlib import Path
 
 import telethon
-from src.config import load_config, AppConfig
+
+try:
+    import uvloop
+except ImportError:  # optional speedup; not available on Windows
+    uvloop = None
+
+from src.config import load_config, AppConfig, TRUST_CONFIG_ENV
 from src.telegram.client import TelegramSession
 from src.telegram.gateway import Gateway
 from src.llm.client import LLMClient
@@ -30,24 +41,77 @@ from src.moderation.status import StatusReporter
 
 logger = logging.getLogger(__name__)
 
+# Minimum seconds between status updates triggered by flush-loop ticks
+TICK_MIN_INTERVAL = 5.0
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves message and traceback formatting to the listener."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() formats the record on the calling thread so it
+        # can be pickled; the listener is in-process, so pass it through as is
+        return record
+
 
 def setup_logging(config: AppConfig) -> None:
-    """Configure logging from config."""
+    """Configure logging from config.
+
+    Records are handed to a background listener thread, which does the
+    formatting and the stream/file writes off the event loop.
+    """
     log_cfg = config.logging
-    handlers = [logging.StreamHandler()]
+    formatter = logging.Formatter("%(asctime)s | %(levelname)-7s | %(name)s | %(message)s")
+    handlers: list[logging.Handler] = [logging.StreamHandler()]
 
     if log_cfg.file:
         log_path = Path(log_cfg.file)
         log_path.parent.mkdir(parents=True, exist_ok=True)
         handlers.append(logging.FileHandler(log_path, encoding="utf-8"))
 
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)  # flushes queued records on exit
+
     logging.basicConfig(
         level=getattr(logging, log_cfg.level, logging.INFO),
-        format="%(asctime)s | %(levelname)-7s | %(name)s | %(message)s",
-        handlers=handlers,
+        handlers=[_DeferredQueueHandler(log_queue)],
     )
 
 
+async def _preregister_group(
+    session: TelegramSession,
+    group,
+    newcomer_tracker: NewcomerTracker,
+    admin_ids: set[int],
+) -> None:
+    """Register a group's existing members as non-newcomers and collect its admins."""
+    try:
+        member_ids = {
+            participant.id
+            async for participant in session.client.iter_participants(group, limit=5000)
+        }
+        if member_ids:
+            newcomer_tracker.bulk_register(member_ids)
+            logger.info(
+                f"Pre-registered {len(member_ids)} members from "
+                f"{getattr(group, 'title', group)}"
+            )
+
+        # Fetch admins
+        async for admin in session.client.iter_participants(group, filter=telethon.tl.types.ChannelParticipantsAdmins()):
+            admin_ids.add(admin.id)
+
+    except Exception as e:
+        logger.warning(f"Could not fetch participants/admins for pre-registration: {e}")
+
+
 async def _warmup_loop(
     llm_client: LLMClient,
     system_prompt: str,
@@ -55,12 +119,18 @@ async def _warmup_loop(
     stop_event: asyncio.Event,
 ) -> None:
     """Periodically warm up the local LLM to keep system prompt in KV-cache."""
+    interval_seconds = interval_minutes * 60
     while not stop_event.is_set():
-        await llm_client.warm_up_local(system_prompt)
+        # Real traffic since the last tick already kept the prompt cached
+        idle = time.monotonic() - llm_client.last_local_inference
+        if idle >= interval_seconds:
+            await llm_client.warm_up_local(system_prompt)
+        else:
+            logger.debug(f"Skipping warm-up, local LLM used {idle:.0f}s ago")
         try:
             await asyncio.wait_for(
                 stop_event.wait(),
-                timeout=interval_minutes * 60,
+                timeout=interval_seconds,
             )
         except asyncio.TimeoutError:
             pass
@@ -88,7 +158,9 @@ async def _report_loop(
 
 async def run(config_path: str | None = None) -> None:
     """Main async entry point."""
-    config = load_config(config_path)
+    config = load_config(
+        config_path, trusted=os.environ.get(TRUST_CONFIG_ENV) == "1"
+    )
     setup_logging(config)
 
     logger.info("Starting tg-chat-moderator...")
@@ -154,32 +226,19 @@ async def run(config_path: str | None = None) -> None:
 
     newcomer_tracker = NewcomerTracker(
         window_hours=config.moderation.newcomer_window_hours,
-        persist_path="data/newcomers.json",
+        persist_path="data/newcomers.bin",
     )
 
     admin_ids = set()
 
     # Pre-populate newcomer tracker with existing group members
-    # so they're routed to batch queue (OpenRouter), not instant local LLM
-    for group in monitored_groups:
-        try:
-            member_ids = []
-            async for participant in session.client.iter_participants(group, limit=5000):
-                member_ids.append(participant.id)
-            if member_ids:
-                newcomer_tracker.bulk_register(member_ids)
-                logger.info(
-                    f"Pre-registered {len(member_ids)} members from "
-                    f"{getattr(group, 'title', group)}"
-                )
-            
-            # Fetch admins
-            async for admin in session.client.iter_participants(group, filter=telethon.tl.types.ChannelParticipantsAdmins()):
-                admin_ids.add(admin.id)
-            logger.info(f"Loaded {len(admin_ids)} admins in total.")
-
-        except Exception as e:
-            logger.warning(f"Could not fetch participants/admins for pre-registration: {e}")
+    # so they're routed to batch queue (OpenRouter), not instant local LLM.
+    # Groups are fetched concurrently: startup waits for the slowest, not the sum.
+    await asyncio.gather(*(
+        _preregister_group(session, group, newcomer_tracker, admin_ids)
+        for group in monitored_groups
+    ))
+    logger.info(f"Loaded {len(admin_ids)} admins in total.")
 
     processed_cache = ProcessedCache(max_size=10000)
 
@@ -230,11 +289,25 @@ async def run(config_path: str | None = None) -> None:
 
     # Wire tick callback for periodic status updates
     if status_reporter:
+        # Only touch Telegram when the counters shown in the status message
+        # changed, and never more often than every TICK_MIN_INTERVAL seconds.
+        # (Interval/next-batch time drift every second, so they're not compared.)
+        last_tick = {"state": None, "sent_at": 0.0}
+
         async def _on_tick():
-            await status_reporter.update(
-                quota_manager.status_dict(),
+            quota = quota_manager.status_dict()
+            state = (
+                quota["requests_used"],
+                quota["remaining"],
+                quota["newcomer_requests"],
                 batch_queue.size,
             )
+            now = time.monotonic()
+            if state == last_tick["state"] or now - last_tick["sent_at"] < TICK_MIN_INTERVAL:
+                return
+            last_tick["state"] = state
+            last_tick["sent_at"] = now
+            await status_reporter.update(quota, batch_queue.size)
         batch_queue._on_tick = _on_tick
 
     # --- Gateway ---
@@ -242,6 +315,7 @@ async def run(config_path: str | None = None) -> None:
         session=session,
         engine=engine,
         monitored_groups=monitored_groups,
+        skip_sender_ids=config.moderation.ignored_sender_ids,
     )
 
     # --- Start everything ---
@@ -268,11 +342,21 @@ async def run(config_path: str | None = None) -> None:
         if llm_client.has_openrouter:
             tasks.append(asyncio.create_task(
                 batch_queue.run_loop(
-                    get_interval=lambda: quota_manager.interval_seconds,
+                    get_interval=quota_manager.seconds_until_next_batch,
                     stop_event=stop_event,
                 )
             ))
 
+        # Newcomer state: written at most once a minute, and only when changed
+        tasks.append(asyncio.create_task(
+            newcomer_tracker.periodic_save(stop_event)
+        ))
+
+        # Reputation snapshot: compacted from its change log every 30s
+        tasks.append(asyncio.create_task(
+            reputation.autosave(stop_event)
+        ))
+
         # Report loop
         tasks.append(asyncio.create_task(
             _report_loop(report_generator, action_executor, stop_event)
@@ -292,6 +376,8 @@ async def run(config_path: str | None = None) -> None:
         logger.info("Shutting down...")
     finally:
         stop_event.set()
+        await gateway.stop()
+        await engine.aclose()
         newcomer_tracker.save()
         reputation.save()
         quota_manager.save()
@@ -302,4 +388,7 @@ async def run(config_path: str | None = None) -> None:
 
 def main(config_path: str | None = None) -> None:
     """Synchronous wrapper for run()."""
-    asyncio.run(run(config_path))
+    if uvloop is not None:
+        uvloop.run(run(config_path))
+    else:
+        asyncio.run(run(config_path))
@@ -7,14 +7,91 @@ Adapted from telegram-scraper's forward_to_manual_review pattern.
 
 from __future__ import annotations
 
+import asyncio
 import logging
+from datetime import datetime, timedelta, timezone
 from typing import Optional, Union
 
 from telethon import TelegramClient
-from telethon.tl.types import Channel, Chat
+from telethon.tl.functions.channels import EditBannedRequest
+from telethon.tl.types import Channel, Chat, ChatBannedRights
 
 logger = logging.getLogger(__name__)
 
+# Restrictions applied by mute; only until_date varies per call
+_MUTE_FLAGS = dict(
+    send_messages=True,
+    send_media=True,
+    send_stickers=True,
+    send_gifs=True,
+)
+# Banned until date None = forever for Telegram
+_BAN_RIGHTS = ChatBannedRights(until_date=None, view_messages=True)
+
+_FLAG_TEMPLATE = (
+    "🔍 **Moderation Flag**\n"
+    "📍 Group: {chat_title}\n"
+    "👤 Sender: {sender_name} (ID: {sender_id})\n"
+    "⚖️ Verdict: `{verdict}`\n"
+    "📝 Reason: {reason}\n"
+    "────────────────\n"
+    "{text}"
+)
+
+
+class _DeleteBatcher:
+    """
+    Coalesces message deletions into one delete_messages call per chat.
+
+    Deletes for the same chat requested within `delay` seconds of the first
+    one (up to `max_items`) go out together; each caller still awaits, and
+    sees the outcome of, its own delete.
+    """
+
+    def __init__(self, client: TelegramClient, delay: float = 0.2, max_items: int = 20):
+        self.client = client
+        self.delay = delay
+        self.max_items = max_items
+        # chat_id -> (input chat, [(msg_id, future), ...])
+        self._pending: dict[int, tuple[object, list[tuple[int, asyncio.Future]]]] = {}
+        self._timers: dict[int, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def delete(self, chat_id: int, input_chat, msg_id: int) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        _, items = self._pending.setdefault(chat_id, (input_chat, []))
+        items.append((msg_id, future))
+        if len(items) >= self.max_items:
+            self._flush(chat_id)
+        elif len(items) == 1:
+            self._timers[chat_id] = loop.call_later(self.delay, self._flush, chat_id)
+        await future
+
+    def _flush(self, chat_id: int) -> None:
+        timer = self._timers.pop(chat_id, None)
+        if timer:
+            timer.cancel()
+        entry = self._pending.pop(chat_id, None)
+        if entry:
+            task = asyncio.create_task(self._send(*entry))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, input_chat, items: list[tuple[int, asyncio.Future]]) -> None:
+        try:
+            await self.client.delete_messages(input_chat, [msg_id for msg_id, _ in items])
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for _, future in items:
+                if not future.done():
+                    future.set_result(None)
+            if len(items) > 1:
+                logger.debug(f"Deleted {len(items)} messages in one request")
+
 
 class ActionExecutor:
     """
@@ -28,6 +105,34 @@ class ActionExecutor:
     ):
         self.client = client
         self.review_group = review_group
+        self._deleter = _DeleteBatcher(client)
+
+    async def _act_and_notify(self, action, chat_id: int, notification: str = "") -> None:
+        """
+        Run a moderation call and its chat notification concurrently
+        (one RTT instead of two).
+
+        If the action fails, a notification that already went out is
+        deleted again, so the chat never announces an action that didn't
+        happen. The first failure is then re-raised.
+        """
+        if not notification:
+            await action
+            return
+        action_result, sent = await asyncio.gather(
+            action,
+            self.client.send_message(chat_id, notification),
+            return_exceptions=True,
+        )
+        if isinstance(action_result, BaseException):
+            if not isinstance(sent, BaseException):
+                try:
+                    await self.client.delete_messages(chat_id, [sent.id])
+                except Exception as e:
+                    logger.warning(f"Failed to retract notification {sent.id}: {e}")
+            raise action_result
+        if isinstance(sent, BaseException):
+            raise sent
 
     async def warn(self, message, reason: str, reply_text: str = "") -> bool:
         """Reply to the message with a warning."""
@@ -43,13 +148,22 @@ class ActionExecutor:
             return False
 
     async def delete(self, message, reason: str, reply_text: str = "", sender_name: str = "") -> bool:
-        """Delete the message and post an explanation to the chat."""
+        """
+        Delete the message and post an explanation to the chat.
+
+        Deletes in the same chat are coalesced into one request (see
+        _DeleteBatcher), so a batch flush doesn't cost one RPC per message.
+        """
         try:
             chat_id = message.chat_id
-            await message.delete()
+            input_chat = await message.get_input_chat()
+            notification = ""
             if reply_text:
                 notification = f"🗑 **Message Removed**\n👤 User: {sender_name}\n📝 Reason: {reply_text}"
-                await self.client.send_message(chat_id, notification)
+            await self._act_and_notify(
+                self._deleter.delete(chat_id, input_chat, message.id),
+                chat_id, notification,
+            )
             
             logger.info(
                 f"DELETE: user={message.sender_id} msg={message.id} reason='{reason}'"
@@ -71,30 +185,21 @@ class ActionExecutor:
     ) -> bool:
         """Restrict user in the chat (mute) and post an explanation."""
         try:
-            from telethon.tl.functions.channels import EditBannedRequest
-            from telethon.tl.types import ChatBannedRights
-            from datetime import datetime, timedelta, timezone
-
             until_date = datetime.now(timezone.utc) + timedelta(seconds=duration_seconds)
-            rights = ChatBannedRights(
-                until_date=until_date,
-                send_messages=True,
-                send_media=True,
-                send_stickers=True,
-                send_gifs=True,
-            )
+            rights = ChatBannedRights(until_date=until_date, **_MUTE_FLAGS)
 
-            await self.client(
+            action = self.client(
                 EditBannedRequest(
                     channel=chat,
                     participant=user_id,
                     banned_rights=rights,
                 )
             )
-
             if message and reply_text:
                 notification = f"🔇 **User Muted**\n👤 User: {sender_name}\n⏳ Duration: {duration_seconds//60} mins\n📝 Reason: {reply_text}"
-                await self.client.send_message(message.chat_id, notification)
+                await self._act_and_notify(action, message.chat_id, notification)
+            else:
+                await action
 
             logger.info(
                 f"MUTE: user={user_id} duration={duration_seconds}s reason='{reason}'"
@@ -115,26 +220,18 @@ class ActionExecutor:
     ) -> bool:
         """Permanently ban user from the chat and post an explanation."""
         try:
-            from telethon.tl.functions.channels import EditBannedRequest
-            from telethon.tl.types import ChatBannedRights
-
-            # Banned until date 0 = forever for Telegram
-            rights = ChatBannedRights(
-                until_date=None,
-                view_messages=True,
-            )
-
-            await self.client(
+            action = self.client(
                 EditBannedRequest(
                     channel=chat,
                     participant=user_id,
-                    banned_rights=rights,
+                    banned_rights=_BAN_RIGHTS,
                 )
             )
-
             if message and reply_text:
                 notification = f"🚫 **User Banned**\n👤 User: {sender_name}\n📝 Reason: {reply_text}"
-                await self.client.send_message(message.chat_id, notification)
+                await self._act_and_notify(action, message.chat_id, notification)
+            else:
+                await action
 
             logger.info(
                 f"BAN: user={user_id} reason='{reason}'"
@@ -157,21 +254,20 @@ class ActionExecutor:
             return False
 
         try:
+            sender = message.sender
             sender_name = ""
-            if message.sender:
-                sender_name = getattr(message.sender, "first_name", "") or ""
-                username = getattr(message.sender, "username", "")
-                if username:
-                    sender_name += f" (@{username})"
-
-            context_text = (
-                f"🔍 **Moderation Flag**\n"
-                f"📍 Group: {chat_title}\n"
-                f"👤 Sender: {sender_name} (ID: {message.sender_id})\n"
-                f"⚖️ Verdict: `{verdict}`\n"
-                f"📝 Reason: {reason}\n"
-                f"────────────────\n"
-                f"{message.text}"
+            if sender:
+                first = getattr(sender, "first_name", "") or ""
+                username = getattr(sender, "username", "")
+                sender_name = f"{first} (@{username})" if username else first
+
+            context_text = _FLAG_TEMPLATE.format(
+                chat_title=chat_title,
+                sender_name=sender_name,
+                sender_id=message.sender_id,
+                verdict=verdict,
+                reason=reason,
+                text=message.text,
             )
 
             await self.client.send_message(self.review_group, context_text)
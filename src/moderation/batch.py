@@ -12,14 +12,48 @@ import asyncio
 import json
 import logging
 import re
+import sys
 import time
 from dataclasses import dataclass, field
 from typing import Optional, Union, Callable, Awaitable
 
 from telethon.tl.types import Channel, Chat
 
+from src import jsonutil
+
 logger = logging.getLogger(__name__)
 
+# Whole lines that open or close a markdown code fence
+_FENCE_LINE_RE = re.compile(r"^[ \t]*```.*(?:\n|$)", re.MULTILINE)
+# Stdlib decoder for raw_decode(), which orjson has no equivalent of
+_DECODER = json.JSONDecoder()
+
+
+if sys.version_info >= (3, 11):
+    async def _wait_event(event: asyncio.Event, timeout: float) -> None:
+        """Wait for the event or the timeout, whichever comes first."""
+        # asyncio.timeout schedules a call_later instead of wrapping the
+        # wait in a new Task like wait_for does
+        try:
+            async with asyncio.timeout(timeout):
+                await event.wait()
+        except TimeoutError:
+            pass
+else:
+    async def _wait_event(event: asyncio.Event, timeout: float) -> None:
+        """Wait for the event or the timeout, whichever comes first."""
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+def strip_code_fences(text: str) -> str:
+    """Drop markdown fence lines (```json ... ```) from a stripped LLM response."""
+    if text.startswith("```"):
+        return _FENCE_LINE_RE.sub("", text).strip()
+    return text
+
 
 @dataclass
 class QueuedMessage:
@@ -29,13 +63,15 @@ class QueuedMessage:
     chat: Union[Chat, Channel]
     sender_name: str
     user_id: int
-    enqueued_at: float = field(default_factory=time.time)
+    enqueued_at: float = field(default_factory=time.monotonic)  # for dwell time, not wall clock
+    estimated_tokens: int = field(init=False)
+    payload_json: bytes = field(init=False, repr=False)
 
-    @property
-    def estimated_tokens(self) -> int:
-        """Rough token estimate (~4 chars per token)."""
-        text = self.payload.get("message", "")
-        return max(1, len(text) // 4)
+    def __post_init__(self):
+        # Rough token estimate (~4 chars per token), computed once
+        self.estimated_tokens = max(1, len(self.payload.get("message", "")) // 4)
+        # Serialized once on enqueue; spliced into the batch prompt at flush
+        self.payload_json = jsonutil.dumps(self.payload)
 
 
 class BatchQueue:
@@ -45,6 +81,10 @@ class BatchQueue:
     Flush triggers:
       1. Quota interval timer fires
       2. Accumulated tokens >= max_batch_tokens
+
+    A message that would push the open batch past max_batch_tokens seals
+    that batch for immediate flushing and starts a new one, so batches
+    stay within the budget instead of overshooting it.
     """
 
     def __init__(
@@ -55,12 +95,14 @@ class BatchQueue:
     ):
         self.max_batch_tokens = max_batch_tokens
         self._queue: list[QueuedMessage] = []
-        self._lock = asyncio.Lock()
+        self._token_sum = 0
+        # Full batches waiting for the flush loop, oldest first
+        self._sealed: list[list[QueuedMessage]] = []
         self._flush_event = asyncio.Event()
         self._on_flush = on_flush
         self._on_tick = on_tick
 
-    async def add(
+    def add(
         self,
         payload: dict,
         message,
@@ -69,49 +111,68 @@ class BatchQueue:
         user_id: int,
     ) -> None:
         """Add a message to the batch queue."""
-        async with self._lock:
-            item = QueuedMessage(
-                payload=payload,
-                message=message,
-                chat=chat,
-                sender_name=sender_name,
-                user_id=user_id,
+        # Synchronous: the enqueue completes before the caller's next await,
+        # so no other coroutine can observe a partial update and a flush
+        # can't miss a message that was already accepted.
+        item = QueuedMessage(
+            payload=payload,
+            message=message,
+            chat=chat,
+            sender_name=sender_name,
+            user_id=user_id,
+        )
+
+        # Admission check: seal the open batch rather than overshoot the budget
+        if self._queue and self._token_sum + item.estimated_tokens > self.max_batch_tokens:
+            logger.info(
+                f"Batch token budget would be exceeded ({self._token_sum} + "
+                f"{item.estimated_tokens} > {self.max_batch_tokens}), sealing batch"
             )
-            self._queue.append(item)
-            total_tokens = self.estimated_tokens
-
-            logger.debug(
-                f"Batch queue: +1 msg (total={len(self._queue)}, "
-                f"~{total_tokens} tokens)"
+            self._sealed.append(self._queue)
+            self._queue = []
+            self._token_sum = 0
+            self._flush_event.set()
+
+        self._queue.append(item)
+        self._token_sum += item.estimated_tokens
+        total_tokens = self._token_sum
+
+        logger.debug(
+            f"Batch queue: +1 msg (total={len(self._queue)}, "
+            f"~{total_tokens} tokens)"
+        )
+
+        # Trigger flush if token limit reached
+        if total_tokens >= self.max_batch_tokens:
+            logger.info(
+                f"Batch token limit reached ({total_tokens} >= "
+                f"{self.max_batch_tokens}), triggering flush"
             )
-
-            # Trigger flush if token limit reached
-            if total_tokens >= self.max_batch_tokens:
-                logger.info(
-                    f"Batch token limit reached ({total_tokens} >= "
-                    f"{self.max_batch_tokens}), triggering flush"
-                )
-                self._flush_event.set()
+            self._flush_event.set()
 
     async def drain(self) -> list[QueuedMessage]:
-        """Remove and return all queued messages."""
-        async with self._lock:
-            items = list(self._queue)
-            self._queue.clear()
-            return items
+        """Remove and return the next batch (oldest sealed batch first)."""
+        if self._sealed:
+            return self._sealed.pop(0)
+        items = self._queue
+        self._queue = []
+        self._token_sum = 0
+        return items
 
     @property
     def estimated_tokens(self) -> int:
         """Total estimated tokens in queue."""
-        return sum(m.estimated_tokens for m in self._queue)
+        return self._token_sum + sum(
+            m.estimated_tokens for batch in self._sealed for m in batch
+        )
 
     @property
     def size(self) -> int:
-        return len(self._queue)
+        return len(self._queue) + sum(len(batch) for batch in self._sealed)
 
     @property
     def is_empty(self) -> bool:
-        return len(self._queue) == 0
+        return not self._queue and not self._sealed
 
     def trigger_flush(self) -> None:
         """Manually trigger a flush (e.g. from quota timer)."""
@@ -136,13 +197,7 @@ class BatchQueue:
 
             # Wait for either: interval timer OR token-limit trigger
             interval = get_interval()
-            try:
-                await asyncio.wait_for(
-                    self._flush_event.wait(),
-                    timeout=max(1.0, interval),
-                )
-            except asyncio.TimeoutError:
-                pass  # Timer fired
+            await _wait_event(self._flush_event, max(1.0, interval))
 
             self._flush_event.clear()
 
@@ -162,6 +217,10 @@ class BatchQueue:
                 except Exception as e:
                     logger.error(f"Batch flush error: {e}", exc_info=True)
 
+            # More full batches pending: go round again without waiting
+            if self._sealed:
+                self._flush_event.set()
+
     @staticmethod
     def build_batch_prompt(items: list[QueuedMessage]) -> str:
         """
@@ -169,14 +228,13 @@ class BatchQueue:
 
         Returns JSON array of message payloads.
         """
-        payloads = []
+        parts = []
         for i, item in enumerate(items):
-            payloads.append({
-                "index": i,
-                "message_id": item.message.id if hasattr(item.message, 'id') else 0,
-                **item.payload,
-            })
-        return json.dumps(payloads, ensure_ascii=False)
+            message_id = item.message.id if hasattr(item.message, 'id') else 0
+            body = item.payload_json[1:]  # drop the opening '{'
+            sep = b"," if body != b"}" else b""
+            parts.append(b'{"index":%d,"message_id":%d%s%s' % (i, message_id, sep, body))
+        return (b"[" + b",".join(parts) + b"]").decode("utf-8")
 
     @staticmethod
     def parse_batch_verdicts(raw: str, expected_count: int) -> list[dict]:
@@ -188,40 +246,42 @@ class BatchQueue:
         cleaned = raw.strip()
 
         # Strip markdown fences
-        if cleaned.startswith("```"):
-            lines = cleaned.split("\n")
-            lines = [l for l in lines if not l.strip().startswith("```")]
-            cleaned = "\n".join(lines).strip()
+        cleaned = strip_code_fences(cleaned)
 
         # Try parsing as JSON array
         try:
-            result = json.loads(cleaned)
+            result = jsonutil.loads(cleaned)
             if isinstance(result, list):
                 return result
-        except json.JSONDecodeError:
+        except jsonutil.JSONDecodeError:
             pass
 
-        # Try extracting a JSON array
-        match = re.search(r'\[.*\]', cleaned, re.DOTALL)
-        if match:
+        # Prose around the JSON: decode in place from the first '[' that
+        # starts a valid array (raw_decode stops at the end of the value)
+        pos = cleaned.find("[")
+        while pos >= 0:
             try:
-                result = json.loads(match.group())
+                result, _ = _DECODER.raw_decode(cleaned, pos)
                 if isinstance(result, list):
                     return result
-            except json.JSONDecodeError:
+            except ValueError:
                 pass
+            pos = cleaned.find("[", pos + 1)
 
         # Try extracting individual JSON objects
-        objects = re.findall(r'\{[^{}]+\}', cleaned)
-        if objects:
-            verdicts = []
-            for obj_str in objects:
-                try:
-                    verdicts.append(json.loads(obj_str))
-                except json.JSONDecodeError:
-                    continue
-            if verdicts:
-                return verdicts
+        verdicts = []
+        pos = cleaned.find("{")
+        while pos >= 0:
+            try:
+                obj, end = _DECODER.raw_decode(cleaned, pos)
+            except ValueError:
+                pos = cleaned.find("{", pos + 1)
+                continue
+            if isinstance(obj, dict):
+                verdicts.append(obj)
+            pos = cleaned.find("{", end)
+        if verdicts:
+            return verdicts
 
         logger.warning(f"Failed to parse batch verdicts, returning all 'ok'. Raw response: {raw}")
         return [
@@ -0,0 +1,82 @@
+"""
+Circuit Breaker Module
+
+Stops calling a failing LLM endpoint for a cool-off period, so an
+outage doesn't make every message wait out a timeout.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Stops calling a failing dependency for a cool-off period.
+
+    Opens after `fail_threshold` consecutive failures. Once the timeout
+    passes, one probe is let through (half-open): success closes the
+    circuit, failure reopens it with the timeout doubled, up to
+    `max_timeout`. Only real calls to the dependency should be recorded,
+    so the failure count doesn't depend on unrelated traffic.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fail_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        max_timeout: float = 300.0,
+    ):
+        self.name = name
+        self.fail_threshold = fail_threshold
+        self.reset_timeout = reset_timeout
+        self.max_timeout = max_timeout
+        self._failures = 0
+        self._timeout = reset_timeout
+        self._opened_at: Optional[float] = None
+        # When the half-open probe was let through; None if none is out
+        self._probe_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        """Whether a call may go through now."""
+        if self._opened_at is None:
+            return True
+        now = time.monotonic()
+        if now - self._opened_at < self._timeout:
+            return False
+        # A probe that never reported back (e.g. cancelled) expires too
+        if self._probe_at is not None and now - self._probe_at < self._timeout:
+            return False
+        self._probe_at = now
+        return True
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info(f"{self.name} circuit closed — calls resumed.")
+        self._failures = 0
+        self._timeout = self.reset_timeout
+        self._opened_at = None
+        self._probe_at = None
+
+    def record_failure(self) -> None:
+        if self._probe_at is not None:
+            self._probe_at = None
+            self._timeout = min(self._timeout * 2, self.max_timeout)
+            self._opened_at = time.monotonic()
+            return
+        self._failures += 1
+        if self._opened_at is None and self._failures >= self.fail_threshold:
+            self._opened_at = time.monotonic()
+            logger.warning(
+                f"{self.name} circuit open after {self._failures} consecutive "
+                f"failures; skipping calls for {self._timeout:.0f}s"
+            )
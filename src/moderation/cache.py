@@ -1,20 +1,25 @@
 """
 Processed Message Cache Module
 
-LRU cache to prevent duplicate LLM processing of the same message.
+Bounded cache to prevent duplicate LLM processing of the same message.
 """
 
 from __future__ import annotations
 
 import logging
-from collections import OrderedDict
+from collections import deque
 
 logger = logging.getLogger(__name__)
 
 
+def _pack_key(chat_id: int, msg_id: int) -> int:
+    """Pack (chat_id, msg_id) into one int; message IDs fit in 32 bits."""
+    return (chat_id << 32) | (msg_id & 0xFFFFFFFF)
+
+
 class ProcessedCache:
     """
-    LRU cache keyed by (chat_id, message_id).
+    Bounded FIFO set keyed by (chat_id, message_id), packed into a single int.
 
     Prevents duplicate LLM calls when the same message
     triggers multiple events or retries.
@@ -22,26 +27,40 @@ class ProcessedCache:
 
     def __init__(self, max_size: int = 10000):
         self.max_size = max_size
-        self._cache: OrderedDict[tuple[int, int], bool] = OrderedDict()
+        self._keys: set[int] = set()
+        # Insertion order for eviction; the set answers membership
+        self._order: deque[int] = deque(maxlen=max_size)
+
+    def _add(self, key: int) -> None:
+        if self.max_size <= 0:
+            return
+        if len(self._order) == self.max_size:
+            self._keys.discard(self._order[0])
+        self._order.append(key)  # drops the oldest key when full
+        self._keys.add(key)
 
     def is_processed(self, chat_id: int, msg_id: int) -> bool:
         """Check if message was already processed."""
-        key = (chat_id, msg_id)
-        if key in self._cache:
-            self._cache.move_to_end(key)
-            return True
-        return False
+        return _pack_key(chat_id, msg_id) in self._keys
 
     def mark_processed(self, chat_id: int, msg_id: int) -> None:
         """Mark message as processed."""
-        key = (chat_id, msg_id)
-        self._cache[key] = True
-        self._cache.move_to_end(key)
+        key = _pack_key(chat_id, msg_id)
+        if key not in self._keys:
+            self._add(key)
+
+    def check_and_mark(self, chat_id: int, msg_id: int) -> bool:
+        """
+        Mark message as processed in one step.
 
-        # Evict oldest if over limit
-        while len(self._cache) > self.max_size:
-            self._cache.popitem(last=False)
+        Returns True if it had already been processed (a duplicate).
+        """
+        key = _pack_key(chat_id, msg_id)
+        if key in self._keys:
+            return True
+        self._add(key)
+        return False
 
     @property
     def size(self) -> int:
-        return len(self._cache)
+        return len(self._keys)
@@ -10,21 +10,41 @@ Pre-filter → dedup → newcomer check → route → action dispatch.
 
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import re
 import httpx
 import time
-from collections import defaultdict
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Optional, Union
 
-from telethon.tl.types import Channel, Chat
+from telethon.tl.types import Channel, Chat, User
 
-from src.config import ModerationConfig
-from src.llm.client import LLMClient
+try:
+    from re import _parser as _sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse as _sre_parse
+
+try:
+    import ahocorasick
+except ImportError:  # optional: pip install pyahocorasick
+    ahocorasick = None
+
+try:
+    import hyperscan
+except ImportError:  # optional: pip install hyperscan
+    hyperscan = None
+
+from src import jsonutil
+from src.config import ModerationConfig, compile_regex_union
+from src.llm.client import ChatMessage, ChatResponse, LLMClient, Message as LLMMessage
 from src.llm.prompts import ModerationPromptBuilder
 from src.moderation.actions import ActionExecutor
-from src.moderation.batch import BatchQueue, QueuedMessage
+from src.moderation.breaker import CircuitBreaker
+from src.moderation.batch import BatchQueue, QueuedMessage, strip_code_fences
 from src.moderation.cache import ProcessedCache
 from src.moderation.newcomer import NewcomerTracker
 from src.moderation.quota import QuotaManager
@@ -34,6 +54,103 @@ from src.moderation.status import StatusReporter
 
 logger = logging.getLogger(__name__)
 
+# Initial capacity of the per-user state arrays (doubled on demand)
+_USER_SLOTS_INITIAL = 1024
+_MAX_WARNINGS = 0xFFFF
+
+# Appended to the system prompt for batch requests
+BATCH_INSTRUCTION = (
+    "\n\n---\n"
+    "BATCH MODE: You will receive an array of messages. "
+    "Return a JSON ARRAY of verdicts, one per message, "
+    "in the same order. Each verdict has the same format: "
+    '{"verdict": "ok"|"warn"|"delete"|"mute"|"ban", '
+    '"reason": "...", "reply": "...", "index": N}'
+)
+
+# Stdlib decoder for raw_decode(), which orjson has no equivalent of
+_DECODER = json.JSONDecoder()
+
+# Above this many keywords (and without pyahocorasick) scan with one regex
+_KEYWORD_LOOP_MAX = 32
+
+_GATE_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789 ")
+# The only non-ASCII chars re.IGNORECASE matches against a gate char
+# (İ ı → i, ſ → s, Kelvin sign → k); folded before gating so a gate
+# never rejects text the regex itself would match
+_GATE_FOLDS = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s", "\u212a": "k"})
+
+
+def _mandatory_literals(pattern: str, min_len: int = 3) -> tuple[str, ...]:
+    """
+    Lower-cased literal runs that every match of `pattern` must contain.
+
+    Only top-level literals are considered: a top-level alternation, or any
+    pattern the parser rejects, yields no gates (always run the regex).
+    """
+    try:
+        parsed = _sre_parse.parse(pattern, re.IGNORECASE)
+    except (re.error, RecursionError):
+        return ()
+
+    runs: list[str] = []
+    current: list[str] = []
+    for op, arg in parsed:
+        if op == _sre_parse.BRANCH:
+            return ()
+        if op == _sre_parse.LITERAL:
+            char = chr(arg).lower()
+            if char in _GATE_CHARS:
+                current.append(char)
+                continue
+        if len(current) >= min_len:
+            runs.append("".join(current))
+        current = []
+    if len(current) >= min_len:
+        runs.append("".join(current))
+    return tuple(runs)
+
+
+
+def _message_text(message) -> str:
+    """Message text, rendering formatting entities only when there are any."""
+    # .text re-renders entities as markdown on every access; plain messages
+    # have nothing to render, and entity messages keep their hidden links
+    if getattr(message, "entities", None):
+        return message.text or ""
+    return getattr(message, "message", None) or ""
+
+
+def _extract_sender(sender) -> tuple[str, Optional[str]]:
+    """(display name, @username) of a message sender; name falls back to "Unknown"."""
+    if sender is None:
+        return "Unknown", None
+    if type(sender) is User:
+        first, last, username = sender.first_name, sender.last_name, sender.username
+    else:  # channel posting as itself, or a not-yet-resolved entity
+        first = getattr(sender, "first_name", None)
+        last = getattr(sender, "last_name", None)
+        username = getattr(sender, "username", None)
+    name = f"{first} {last}" if first and last else first or last
+    return name or "Unknown", username
+
+
+@dataclass(slots=True, frozen=True)
+class EvalResult:
+    """
+    Outcome of evaluating one message.
+
+    status is "ok", "error" (evaluation raised), "llm_error" (the LLM
+    call failed and the message was let through, fail-open) or "skipped"
+    (not evaluated: the instant LLM circuit is open, or shutdown).
+    """
+    status: str
+    error: Optional[BaseException] = None
+
+
+_EVAL_OK = EvalResult("ok")
+_EVAL_SKIPPED = EvalResult("skipped")
+
 
 class PreFilter:
     """
@@ -45,24 +162,127 @@ class PreFilter:
         self,
         keywords: list[str] | None = None,
         regex_patterns: list[str] | None = None,
+        regex_union: Optional[re.Pattern] = None,
+        max_chars: int = 8192,
     ):
-        self.keywords = [k.lower() for k in (keywords or [])]
+        # Leading slice of a message that is scanned; 0 scans everything
+        self.max_chars = max_chars
+        self.keywords = [k.lower() for k in (keywords or []) if k]
+        # One automaton over all keywords: a single linear pass per message
+        # instead of one substring scan per keyword.
+        self._ac = None
+        if ahocorasick is not None and self.keywords:
+            self._ac = ahocorasick.Automaton()
+            for keyword in self.keywords:
+                self._ac.add_word(keyword, keyword)
+            self._ac.make_automaton()
+        # Without it, large keyword lists are scanned as one literal
+        # alternation by the C regex engine instead of a Python-level loop.
+        self._kw_re: Optional[re.Pattern] = None
+        if self._ac is None and len(self.keywords) > _KEYWORD_LOOP_MAX:
+            self._kw_re = re.compile("|".join(map(re.escape, self.keywords)))
         self.compiled_regex = []
+        # (pattern, literals it needs): skip re.search unless all are present
+        self._regex_gates: list[tuple[re.Pattern, tuple[str, ...]]] = []
         for pattern in (regex_patterns or []):
             try:
-                self.compiled_regex.append(re.compile(pattern, re.IGNORECASE))
+                compiled = re.compile(pattern, re.IGNORECASE)
             except re.error as e:
                 logger.warning(f"Invalid regex pattern '{pattern}': {e}")
+                continue
+            self.compiled_regex.append(compiled)
+            self._regex_gates.append((compiled, _mandatory_literals(pattern)))
+        # All patterns as one alternation (see compile_regex_union): a single
+        # search both decides and, via the named group, attributes a match.
+        # None if the patterns can't be combined — fall back to the loop.
+        if regex_union is None and self.compiled_regex:
+            regex_union = compile_regex_union(regex_patterns)
+        self.regex_union = regex_union
+        self._hs_db = self._compile_hyperscan() if hyperscan is not None else None
+
+    def _compile_hyperscan(self):
+        """Compile all valid patterns into one Hyperscan database, or None."""
+        if not self.compiled_regex:
+            return None
+        flags = (
+            hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH
+            | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_UCP
+        )
+        db = hyperscan.Database()
+        try:
+            db.compile(
+                expressions=[p.pattern.encode() for p in self.compiled_regex],
+                ids=list(range(len(self.compiled_regex))),
+                elements=len(self.compiled_regex),
+                flags=[flags] * len(self.compiled_regex),
+            )
+        except hyperscan.error as e:
+            # Backreferences, lookarounds etc. aren't supported — stay on `re`
+            logger.info(f"Hyperscan unavailable for regex pre-filter: {e}")
+            return None
+        return db
+
+    def _scan_hyperscan(self, text: str) -> Optional[str]:
+        hits: list[int] = []
+
+        def on_match(pattern_id, start, end, flags, context):
+            hits.append(pattern_id)
+            return True  # stop at the first hit
+
+        try:
+            self._hs_db.scan(text.encode(), match_event_handler=on_match)
+        except hyperscan.ScanTerminated:
+            pass
+        if hits:
+            return f"regex:{self.compiled_regex[hits[0]].pattern}"
+        return None
 
     def check(self, text: str) -> Optional[str]:
         """Check if message matches any pre-filter rule."""
-        text_lower = text.lower()
+        if not self.keywords and not self.compiled_regex:
+            return None
 
-        for keyword in self.keywords:
-            if keyword in text_lower:
-                return f"keyword:{keyword}"
+        if self.max_chars and len(text) > self.max_chars:
+            text = text[:self.max_chars]
 
-        for pattern in self.compiled_regex:
+        # Hyperscan-only configs never need the lowered copy
+        text_lower = (
+            text.lower() if self.keywords or self._hs_db is None else ""
+        )
+
+        if self._ac is not None:
+            hit = next(self._ac.iter(text_lower), None)
+            if hit is not None:
+                return f"keyword:{hit[1]}"
+        elif self._kw_re is not None:
+            m = self._kw_re.search(text_lower)
+            if m is not None:
+                return f"keyword:{m.group()}"
+        else:
+            for keyword in self.keywords:
+                if keyword in text_lower:
+                    return f"keyword:{keyword}"
+
+        if self._hs_db is not None:
+            return self._scan_hyperscan(text)
+
+        gate_text = text_lower
+        if not gate_text.isascii():
+            gate_text = text.translate(_GATE_FOLDS).lower()
+        candidates = [
+            pattern for pattern, gates in self._regex_gates
+            if all(tok in gate_text for tok in gates)
+        ]
+        if not candidates:
+            return None
+
+        if self.regex_union is not None:
+            m = self.regex_union.search(text)
+            if m is None:
+                return None
+            return f"regex:{self.compiled_regex[int(m.lastgroup[2:])].pattern}"
+
+        for pattern in candidates:
             if pattern.search(text):
                 return f"regex:{pattern.pattern}"
 
@@ -77,6 +297,9 @@ class ModerationEngine:
     Regulars  → batch queue → OpenRouter
     """
 
+    # Known test chats, by |chat_id| (basic group and supergroup forms)
+    _TEST_CHAT_MAGNITUDES = frozenset({5139770999, 1005139770999})
+
     def __init__(
         self,
         config: ModerationConfig,
@@ -109,37 +332,135 @@ class ModerationEngine:
         self.pre_filter = PreFilter(
             keywords=config.hard_ban_keywords,
             regex_patterns=config.hard_ban_regex,
+            regex_union=config.hard_ban_union,
+            max_chars=config.prefilter_max_chars,
         )
 
+        # Sheds the instant LLM call (only) while the LLM keeps failing;
+        # pre-filter, bookkeeping and batch enqueueing always run
+        self._llm_breaker = CircuitBreaker("Instant LLM")
+
         # Dry run mode
         self.dry_run = config.dry_run
         if self.dry_run:
             logger.info("🔇 DRY RUN MODE — no actions will be taken, only forwarding to review")
 
-        # Per-user cooldown tracking
-        self._user_last_action: dict[int, float] = defaultdict(float)
-        # Per-user warning counter (in-memory; reset on restart)
-        self._user_warnings: dict[int, int] = defaultdict(int)
-
-    def _is_on_cooldown(self, user_id: int) -> bool:
+        # Per-user state as parallel arrays indexed by a compact slot:
+        # last action timestamp (cooldown) and warning counter (in-memory;
+        # reset on restart). Capped at user_state_max_entries: the least
+        # recently seen user's slot is reused.
+        self._slot_of: OrderedDict[int, int] = OrderedDict()
+        self._last_action = array("d", bytes(8 * _USER_SLOTS_INITIAL))
+        self._warnings = array("H", bytes(2 * _USER_SLOTS_INITIAL))
+        # Bounds concurrent Telegram calls when applying batch verdicts
+        self._action_sem = asyncio.Semaphore(config.max_concurrent_actions)
+        # Batch-mode system message, cached per loaded system prompt
+        self._batch_prompt_base: Optional[str] = None
+        self._batch_system: Optional[ChatMessage] = None
+        # Strong refs to background tasks so they aren't garbage-collected
+        self._bg_tasks: set[asyncio.Task] = set()
+
+        # chat_id -> whether it's a test group (admins are moderated there too)
+        self._test_group_cache: dict[int, bool] = {}
+
+    def _is_test_group(self, chat_id: int, chat_title: str) -> bool:
+        cached = self._test_group_cache.get(chat_id)
+        if cached is None:
+            magnitude = chat_id if chat_id >= 0 else -chat_id
+            cached = (
+                magnitude in self._TEST_CHAT_MAGNITUDES
+                or "test" in str(chat_title).lower()
+            )
+            self._test_group_cache[chat_id] = cached
+        return cached
+
+    def _slot(self, user_id: int) -> int:
+        """Slot of a user in the state arrays, allocating one if needed."""
+        slot = self._lookup(user_id)
+        if slot is not None:
+            return slot
+        max_entries = self.config.user_state_max_entries
+        if len(self._slot_of) >= max_entries:
+            _, slot = self._slot_of.popitem(last=False)
+            self._last_action[slot] = 0.0
+            self._warnings[slot] = 0
+        else:
+            slot = len(self._slot_of)
+            if slot == len(self._last_action):
+                grow = min(slot, max_entries - slot)
+                self._last_action.extend(array("d", bytes(8 * grow)))
+                self._warnings.extend(array("H", bytes(2 * grow)))
+        self._slot_of[user_id] = slot
+        return slot
+
+    def _lookup(self, user_id: int) -> Optional[int]:
+        """Slot of a known user (marking it recently used), else None."""
+        slot = self._slot_of.get(user_id)
+        if slot is not None:
+            self._slot_of.move_to_end(user_id)
+        return slot
+
+    def _is_on_cooldown(self, user_id: int, now: float) -> bool:
         if self.config.user_cooldown_seconds <= 0:
             return False
-        elapsed = time.time() - self._user_last_action[user_id]
-        return elapsed < self.config.user_cooldown_seconds
+        slot = self._lookup(user_id)
+        if slot is None:
+            return False
+        return now - self._last_action[slot] < self.config.user_cooldown_seconds
+
+    def _record_action(self, user_id: int, now: Optional[float] = None) -> None:
+        self._last_action[self._slot(user_id)] = time.time() if now is None else now
+
+    def _warning_count(self, user_id: int) -> int:
+        slot = self._lookup(user_id)
+        return 0 if slot is None else self._warnings[slot]
 
-    def _record_action(self, user_id: int) -> None:
-        self._user_last_action[user_id] = time.time()
+    def _add_warning(self, user_id: int) -> None:
+        slot = self._slot(user_id)
+        if self._warnings[slot] < _MAX_WARNINGS:
+            self._warnings[slot] += 1
+
+    def record_activity(self, message) -> None:
+        """Count a message that needs no evaluation toward reputation and newcomer state."""
+        user_id = message.sender_id
+        if user_id is None:
+            return
+        now = time.time()
+        self.reputation.update_activity(user_id, now)
+        self.newcomer.register_user(user_id, now)
+
+    async def evaluate_batch(
+        self, items: list[tuple[object, Union[Chat, Channel]]]
+    ) -> list[EvalResult]:
+        """
+        Evaluate several (message, chat) pairs concurrently.
+
+        Failures come back as "error" results rather than being raised,
+        so one bad message does not affect the rest of the batch.
+        """
+        results = await asyncio.gather(
+            *(self.evaluate(message, chat) for message, chat in items),
+            return_exceptions=True,
+        )
+        return [
+            EvalResult("error", r) if isinstance(r, BaseException) else r or _EVAL_OK
+            for r in results
+        ]
 
     async def evaluate(
         self,
         message,
         chat: Union[Chat, Channel],
-    ) -> None:
+    ) -> Optional[EvalResult]:
         """
         Evaluate a message through the dual-path moderation pipeline.
+
+        Returns an "llm_error" result when the instant LLM call failed, or
+        "skipped" when its circuit breaker is open (either way the message
+        is let through); otherwise None.
         """
         user_id = message.sender_id
-        text = message.text or ""
+        text = _message_text(message)
         chat_id = getattr(chat, "id", getattr(message, "chat_id", 0))
         chat_title = getattr(chat, "title", str(chat_id))
 
@@ -147,42 +468,37 @@ class ModerationEngine:
         if user_id is None:
             return
 
+        # 1. Dedup check — first, so duplicates don't inflate activity or context
+        if self.cache.check_and_mark(chat_id, message.id):
+            return
+
+        # One clock read for every time-based check on this message
+        now = time.time()
+
         # Record activity for reputation tracking
-        self.reputation.update_activity(user_id)
+        self.reputation.update_activity(user_id, now)
 
         # Skip admin users (unless we are in a test group, where we WANT to test the bot)
-        is_test_group = "test" in str(chat_title).lower() or abs(int(chat_id)) == 5139770999 or abs(int(chat_id)) == 1005139770999
+        is_test_group = self._is_test_group(chat_id, chat_title)
         if user_id in self.admin_ids and not is_test_group:
             logger.info(f"Skipping admin user: {user_id} in {chat_title}")
             return
 
         # 0. Extract sender info
-        sender_name = ""
-        sender_username = None
-        if message.sender:
-            sender_name = getattr(message.sender, "first_name", "") or ""
-            last = getattr(message.sender, "last_name", "")
-            if last:
-                sender_name += f" {last}"
-            sender_username = getattr(message.sender, "username", None)
+        sender_name, sender_username = _extract_sender(message.sender)
 
         # Always add to context window
         self.prompts.add_context_message(
-            sender_name=sender_name or "Unknown",
+            sender_name=sender_name,
             sender_username=sender_username,
             text=text,
         )
 
-        # 1. Dedup check
-        if self.cache.is_processed(chat_id, message.id):
-            return
-        self.cache.mark_processed(chat_id, message.id)
-
         # 2. Register user for newcomer tracking
-        self.newcomer.register_user(user_id)
+        self.newcomer.register_user(user_id, now)
 
         # 3. Cooldown check
-        if self._is_on_cooldown(user_id):
+        if self._is_on_cooldown(user_id, now):
             logger.info(f"User {user_id} on cooldown, skipping")
             return
 
@@ -190,74 +506,76 @@ class ModerationEngine:
         pre_match = self.pre_filter.check(text)
         if pre_match:
             logger.info(f"Pre-filter hit: {pre_match} | user={user_id}")
-            self._record_action(user_id)
+            self._record_action(user_id, now)
 
             if self.dry_run:
                 logger.info(f"🔇 DRY RUN: would delete msg={message.id} (pre-filter: {pre_match})")
             else:
-                self._user_warnings[user_id] += 1
+                self._add_warning(user_id)
                 await self.actions.delete(
                     message,
                     reason=f"Pre-filter: {pre_match}",
                     reply_text="🚫 This message was removed by auto-moderator.",
-                    sender_name=sender_name or "Unknown",
+                    sender_name=sender_name,
                 )
 
-            await self.actions.forward_to_review(
+            self._spawn(self.actions.forward_to_review(
                 message,
                 chat_title=chat_title,
                 verdict="delete (pre-filter)" + (" [DRY RUN]" if self.dry_run else ""),
                 reason=pre_match,
-            )
+            ))
             return
 
-        # 5. Build LLM payload
-        warnings_count = self._user_warnings.get(user_id, 0)
-        messages = self.prompts.build_messages(
-            message_text=text,
-            sender_name=sender_name or "Unknown",
-            sender_username=sender_username,
-            sender_id=user_id,
-            warnings_count=warnings_count,
-        )
-
-        # 6. Route: newcomer → instant local | regular → batch
-        is_test_group_route = "test" in str(chat_title).lower() or abs(int(chat_id)) == 5139770999 or abs(int(chat_id)) == 1005139770999
-        if (self.newcomer.is_newcomer(user_id) or is_test_group_route) and self.llm.has_local:
-            if is_test_group_route:
+        # 5. Route: newcomer → instant local | regular → batch
+        warnings_count = self._warning_count(user_id)
+        if (self.newcomer.is_newcomer(user_id, now) or is_test_group) and self.llm.has_local:
+            if is_test_group:
                 logger.info(f"🧪 Test group message {user_id} — instant local LLM evaluation")
             else:
                 logger.info(f"🆕 Newcomer {user_id} — instant local LLM evaluation")
-            await self._evaluate_instant(
-                messages, message, chat, chat_title,
-                sender_name, user_id, provider="local",
-            )
+            provider = "local"
         elif self.llm.has_openrouter:
-            # Add to batch queue
+            # Add to batch queue (the batch prompt is built at flush time)
             payload = {
                 "message": text,
                 "sender": {
-                    "name": sender_name or "Unknown",
+                    "name": sender_name,
                     "username": sender_username or "",
                     "id": user_id,
                 },
                 "context": [],  # Context handled via system prompt
                 "warnings_count": warnings_count,
             }
-            await self.batch.add(
+            self.batch.add(
                 payload=payload,
                 message=message,
                 chat=chat,
-                sender_name=sender_name or "Unknown",
+                sender_name=sender_name,
                 user_id=user_id,
             )
             logger.debug(f"📦 Regular user {user_id} — queued for batch")
+            return
         else:
             # Fallback: direct evaluation with whatever is available
-            await self._evaluate_instant(
-                messages, message, chat, chat_title,
-                sender_name, user_id, provider="any",
-            )
+            provider = "any"
+
+        if not self._llm_breaker.allow():
+            logger.debug(f"Instant LLM circuit open — not evaluating msg {message.id}")
+            return _EVAL_SKIPPED  # Fail-open, like an LLM error
+
+        # 6. Build LLM payload — only the instant paths need it
+        messages = self.prompts.build_messages(
+            message_text=text,
+            sender_name=sender_name,
+            sender_username=sender_username,
+            sender_id=user_id,
+            warnings_count=warnings_count,
+        )
+        return await self._evaluate_instant(
+            messages, message, chat, chat_title,
+            sender_name, user_id, provider=provider,
+        )
 
     async def _evaluate_instant(
         self,
@@ -268,13 +586,14 @@ class ModerationEngine:
         sender_name: str,
         user_id: int,
         provider: str = "any",
-    ) -> None:
-        """Evaluate a single message instantly via LLM."""
+    ) -> Optional[EvalResult]:
+        """Evaluate a single message instantly via LLM; see evaluate() for the result."""
+        response = None
         try:
             try:
                 # First attempt with full context
                 if provider == "local":
-                    response = await self.llm.chat_local(messages)
+                    response = await self._chat_hedged(messages)
                 elif provider == "openrouter":
                     response = await self.llm.chat_openrouter(messages)
                     self.quota.record_newcomer_request()
@@ -284,15 +603,8 @@ class ModerationEngine:
                 # If local LLM fails with 400 (context overflow/channel error), retry without context
                 if e.response.status_code == 400:
                     logger.warning(f"LLM 400 error (likely context overflow), retrying without message context for msg {message.id}...")
-                    # Re-build messages without context
-                    trimmed_messages = self.prompts.build_messages(
-                        message_text=message.text or "",
-                        sender_name=sender_name,
-                        sender_username=sender_username,
-                        sender_id=user_id,
-                        warnings_count=self._user_warnings.get(user_id, 0),
-                        include_context=False
-                    )
+                    # Same payload with the context array emptied
+                    trimmed_messages = self.prompts.strip_context(messages)
                     if provider == "local":
                         response = await self.llm.chat_local(trimmed_messages)
                     elif provider == "openrouter":
@@ -301,14 +613,56 @@ class ModerationEngine:
                         response = await self.llm.chat(trimmed_messages)
                 else:
                     raise
+            self._llm_breaker.record_success()
 
             verdict = self._parse_verdict(response.content)
             await self._apply_verdict(
                 verdict, message, chat, chat_title, sender_name, user_id
             )
         except Exception as e:
+            if response is None:
+                self._llm_breaker.record_failure()
             logger.error(f"LLM analysis failed for msg {message.id}: {e}")
-            return  # Fail-open
+            return EvalResult("llm_error", e)  # Fail-open
+
+    async def _chat_hedged(self, messages) -> ChatResponse:
+        """
+        Local LLM call, hedged with OpenRouter when it's slow.
+
+        If the local endpoint hasn't answered within hedge_delay_seconds,
+        the same request is sent to OpenRouter and the first successful
+        response wins; the other call is cancelled.
+        """
+        delay = self.config.hedge_delay_seconds
+        if delay <= 0 or not self.llm.has_openrouter or self.quota.remaining_requests <= 0:
+            return await self.llm.chat_local(messages)
+
+        primary = asyncio.create_task(self.llm.chat_local(messages))
+        pending = {primary}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            logger.info(f"Local LLM slower than {delay}s — hedging with OpenRouter")
+            backup = asyncio.create_task(self.llm.chat_openrouter(messages))
+            # Counted as soon as it's sent, whichever call wins
+            self.quota.record_newcomer_request()
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        winner = "local" if task is primary else "openrouter"
+                        logger.debug(f"Hedged LLM call won by {winner}")
+                        return task.result()
+            # Both failed: surface the local error (e.g. a 400 for the retry path)
+            return primary.result()
+        finally:
+            for task in pending:
+                task.cancel()
 
     async def handle_batch_flush(self, batch: BatchQueue) -> None:
         """
@@ -325,19 +679,8 @@ class ModerationEngine:
         batch_prompt_text = BatchQueue.build_batch_prompt(items)
 
         # Build messages with batch instruction
-        system_prompt = self.prompts.system_prompt
-        batch_instruction = (
-            "\n\n---\n"
-            "BATCH MODE: You will receive an array of messages. "
-            "Return a JSON ARRAY of verdicts, one per message, "
-            "in the same order. Each verdict has the same format: "
-            '{"verdict": "ok"|"warn"|"delete"|"mute"|"ban", '
-            '"reason": "...", "reply": "...", "index": N}'
-        )
-
-        from src.llm.client import Message as LLMMessage
         messages = [
-            LLMMessage.system(system_prompt + batch_instruction),
+            self._batch_system_message(),
             LLMMessage.user(batch_prompt_text),
         ]
 
@@ -351,17 +694,65 @@ class ModerationEngine:
             logger.error(f"Batch LLM call failed: {e}")
             return
 
-        # Apply verdicts
-        for i, item in enumerate(items):
+        # Apply verdicts in the background so the flush loop can send the
+        # next pending batch while Telegram calls for this one are in flight
+        self._spawn(self._apply_batch_verdicts(items, verdicts))
+
+    def _batch_system_message(self) -> ChatMessage:
+        """System prompt + BATCH_INSTRUCTION, rebuilt only when the prompt is reloaded."""
+        system_prompt = self.prompts.system_prompt
+        if system_prompt is not self._batch_prompt_base:
+            self._batch_prompt_base = system_prompt
+            self._batch_system = LLMMessage.system(system_prompt + BATCH_INSTRUCTION)
+        return self._batch_system
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """Run a coroutine in the background, keeping a reference to it."""
+        task = asyncio.create_task(coro)
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._on_background_done)
+        return task
+
+    async def aclose(self) -> None:
+        """
+        Wait for background work (batch verdicts, review forwards) to finish.
+
+        Call before closing the LLM client and disconnecting Telegram, so
+        in-flight bans and deletes complete instead of failing.
+        """
+        # Tasks can spawn more tasks (a verdict spawns its review forward)
+        while self._bg_tasks:
+            await asyncio.gather(*self._bg_tasks, return_exceptions=True)
+
+    def _on_background_done(self, task: asyncio.Task) -> None:
+        self._bg_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background task failed: {task.exception()}")
+
+    async def _apply_batch_verdicts(
+        self, items: list[QueuedMessage], verdicts: list[dict]
+    ) -> None:
+        """Apply batch verdicts concurrently, bounded by max_concurrent_actions."""
+
+        async def apply(i: int, item: QueuedMessage) -> None:
             verdict = verdicts[i] if i < len(verdicts) else {
                 "verdict": "ok", "reason": "missing verdict", "reply": ""
             }
             logger.info(f"Batch verdict for msg {item.message.id}: {verdict}")
             chat_title = getattr(item.chat, "title", str(getattr(item.chat, "id", 0)))
-            await self._apply_verdict(
-                verdict, item.message, item.chat,
-                chat_title, item.sender_name, item.user_id,
-            )
+            async with self._action_sem:
+                await self._apply_verdict(
+                    verdict, item.message, item.chat,
+                    chat_title, item.sender_name, item.user_id,
+                )
+
+        results = await asyncio.gather(
+            *(apply(i, item) for i, item in enumerate(items)),
+            return_exceptions=True,
+        )
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                logger.error(f"Failed to apply verdict for msg {item.message.id}: {result}")
 
         # Update status
         if self.status:
@@ -390,17 +781,17 @@ class ModerationEngine:
         self.reports.record_verdict(action)
 
         chat_id = getattr(chat, "id", getattr(message, "chat_id", 0))
-        is_test_group = "test" in str(chat_title).lower() or abs(int(chat_id)) == 5139770999 or abs(int(chat_id)) == 1005139770999
+        is_test_group = self._is_test_group(chat_id, chat_title)
 
         if action == "ok":
             logger.debug(f"OK: msg={message.id} user={user_id}")
             
             # Forward "ok" verdicts from test groups to see the reasoning
             if is_test_group and self.actions.review_group:
-                await self.actions.forward_to_review(
+                self._spawn(self.actions.forward_to_review(
                     message, chat_title=chat_title,
                     verdict="ok [TEST GROUP]", reason=reason,
-                )
+                ))
             return
 
         # --- DRY RUN: only forward to review, no actions ---
@@ -410,10 +801,10 @@ class ModerationEngine:
                 f"reason='{reason[:100]}'"
             )
             if self.actions.review_group:
-                await self.actions.forward_to_review(
+                self._spawn(self.actions.forward_to_review(
                     message, chat_title=chat_title,
                     verdict=f"{action} [DRY RUN]", reason=reason,
-                )
+                ))
             if self.status:
                 await self.status.update(
                     self.quota.status_dict(),
@@ -427,53 +818,53 @@ class ModerationEngine:
         # Check if trusted user - if so, don't auto-ban/mute, just log strike
         if self.reputation.is_trusted(user_id) and action in ("ban", "mute", "delete"):
             logger.info(f"⚠️ Trusted user {user_id} triggered {action} — downgrading to strike.")
-            self.reputation.add_strike(user_id, rule, reason, message.text or "")
+            self.reputation.add_strike(user_id, rule, reason, _message_text(message))
             
             if self.actions.review_group:
-                await self.actions.forward_to_review(
+                self._spawn(self.actions.forward_to_review(
                     message,
                     chat_title=chat_title,
                     verdict=f"STRIKE ({action} bypassed)",
                     reason=f"Trusted user violation of {rule}: {reason}",
-                )
+                ))
             return
 
         if action == "warn":
-            self._user_warnings[user_id] += 1
+            self._add_warning(user_id)
             await self.actions.warn(message, reason=reason, reply_text=reply_text)
 
         elif action == "delete":
-            self._user_warnings[user_id] += 1
+            self._add_warning(user_id)
             await self.actions.delete(
                 message, reason=reason, reply_text=reply_text,
-                sender_name=sender_name or "Unknown",
+                sender_name=sender_name,
             )
 
         elif action == "mute":
-            self._user_warnings[user_id] += 1
+            self._add_warning(user_id)
             await self.actions.mute(
                 chat=chat, user_id=user_id, reason=reason,
                 duration_seconds=self.config.mute_duration_seconds,
                 message=message, reply_text=reply_text,
-                sender_name=sender_name or "Unknown",
+                sender_name=sender_name,
             )
 
         elif action == "ban":
-            self._user_warnings[user_id] += 1
+            self._add_warning(user_id)
             await self.actions.ban(
                 chat=chat, user_id=user_id, reason=reason,
                 message=message, reply_text=reply_text,
-                sender_name=sender_name or "Unknown",
+                sender_name=sender_name,
             )
             if self.status:
                 self.status.record_ban()
 
         # Forward non-ok verdicts to review
         if self.actions.review_group:
-            await self.actions.forward_to_review(
+            self._spawn(self.actions.forward_to_review(
                 message, chat_title=chat_title,
                 verdict=action, reason=reason,
-            )
+            ))
 
         # Update status after actions
         if self.status:
@@ -485,24 +876,22 @@ class ModerationEngine:
     @staticmethod
     def _parse_verdict(raw: str) -> dict:
         """Parse the LLM's JSON verdict response."""
-        cleaned = raw.strip()
-        if cleaned.startswith("```"):
-            lines = cleaned.split("\n")
-            lines = [l for l in lines if not l.strip().startswith("```")]
-            cleaned = "\n".join(lines).strip()
+        cleaned = strip_code_fences(raw.strip())
 
         try:
-            return json.loads(cleaned)
-        except json.JSONDecodeError:
+            return jsonutil.loads(cleaned)
+        except jsonutil.JSONDecodeError:
             pass
 
-        # Try extracting a single JSON object
-        match = re.search(r'\{.*\}', cleaned, re.DOTALL)
-        if match:
+        # Prose around the JSON: decode in place from the first '{' that
+        # starts a valid object (raw_decode stops at the end of the value)
+        pos = cleaned.find("{")
+        while pos >= 0:
             try:
-                return json.loads(match.group())
-            except json.JSONDecodeError:
-                pass
+                obj, _ = _DECODER.raw_decode(cleaned, pos)
+                return obj
+            except ValueError:
+                pos = cleaned.find("{", pos + 1)
 
         logger.warning(f"Failed to parse LLM verdict, treating as 'ok'. Raw response: {raw}")
         return {"verdict": "ok", "reason": "unparseable LLM response", "reply": ""}
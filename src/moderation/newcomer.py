@@ -8,11 +8,16 @@ and get instant local LLM evaluation instead of batched OpenRouter.
 
 from __future__ import annotations
 
-import json
+import asyncio
 import logging
+import os
+import sys
 import time
+from array import array
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
+
+from src import jsonutil
 
 logger = logging.getLogger(__name__)
 
@@ -33,62 +38,132 @@ class NewcomerTracker:
         self.window_seconds = window_hours * 3600
         self.persist_path = Path(persist_path) if persist_path else None
 
-        # {user_id: first_seen_timestamp}
-        self._users: dict[int, float] = {}
+        # Users past the newcomer window only need membership; first-seen
+        # timestamps are kept just for those still inside it
+        self._old_users: set[int] = set()
+        self._newcomer_ts: dict[int, float] = {}  # {user_id: first_seen_timestamp}
+        # Set on every change; save() is a no-op while clean
+        self._dirty = False
 
         if self.persist_path and self.persist_path.exists():
             self._load()
+        elif self.persist_path and self.persist_path.with_suffix(".json").exists():
+            self._load_legacy_json(self.persist_path.with_suffix(".json"))
 
-    def register_user(self, user_id: int) -> None:
+    def register_user(self, user_id: int, now: Optional[float] = None) -> None:
         """Record user as seen. No-op if already known."""
-        if user_id not in self._users:
-            self._users[user_id] = time.time()
+        if user_id not in self._newcomer_ts and user_id not in self._old_users:
+            self._newcomer_ts[user_id] = time.time() if now is None else now
+            self._dirty = True
             logger.debug(f"New user registered: {user_id}")
 
-    def is_newcomer(self, user_id: int) -> bool:
+    def is_newcomer(self, user_id: int, now: Optional[float] = None) -> bool:
         """Check if user is a newcomer (first seen < window ago)."""
-        first_seen = self._users.get(user_id)
+        first_seen = self._newcomer_ts.get(user_id)
         if first_seen is None:
-            return True  # Never seen = newcomer
-        return (time.time() - first_seen) < self.window_seconds
-
-    def bulk_register(self, user_ids: list[int]) -> None:
+            # Known and old, or never seen (= newcomer)
+            return user_id not in self._old_users
+        if now is None:
+            now = time.time()
+        if (now - first_seen) < self.window_seconds:
+            return True
+        # Window has passed: promote
+        del self._newcomer_ts[user_id]
+        self._old_users.add(user_id)
+        return False
+
+    def bulk_register(self, user_ids: Iterable[int]) -> None:
         """Pre-populate known users (e.g. from get_participants on startup)."""
-        now = time.time()
-        # Mark them as "seen long ago" so they're NOT newcomers
-        old_ts = now - self.window_seconds - 1
-        added = 0
-        updated = 0
-        for uid in user_ids:
-            if uid not in self._users:
-                self._users[uid] = old_ts
-                added += 1
+        # Mark them as old so they're NOT newcomers
+        ids = set(user_ids)
+        ids -= self._old_users
+        if not ids:
+            return
+        # If they were already known but as newcomers, make them old
+        updated = ids & self._newcomer_ts.keys()
+        for uid in updated:
+            del self._newcomer_ts[uid]
+        self._old_users |= ids
+
+        self._dirty = True
+        logger.info(
+            f"Bulk-registered: {len(ids) - len(updated)} new, "
+            f"{len(updated)} updated to non-newcomers"
+        )
+
+    def _set_users(self, users: Iterable[tuple[int, float]]) -> None:
+        """Split loaded (user_id, first_seen) pairs into old users and newcomers."""
+        cutoff = time.time() - self.window_seconds
+        for uid, first_seen in users:
+            if first_seen > cutoff:
+                self._newcomer_ts[uid] = first_seen
             else:
-                # If they were already known but as newcomers, make them old
-                if (now - self._users[uid]) < self.window_seconds:
-                    self._users[uid] = old_ts
-                    updated += 1
-        
-        if added or updated:
-            logger.info(f"Bulk-registered: {added} new, {updated} updated to non-newcomers")
+                self._old_users.add(uid)
 
     def save(self) -> None:
-        """Persist state to disk."""
-        if not self.persist_path:
+        """
+        Persist state to disk (only if it changed since the last save).
+
+        Binary layout: all user IDs as little-endian int64, followed by
+        their first-seen timestamps as little-endian float64 (0 for users
+        past the newcomer window).
+        """
+        if not self.persist_path or not self._dirty:
             return
         self.persist_path.parent.mkdir(parents=True, exist_ok=True)
-        data = {str(k): v for k, v in self._users.items()}
-        self.persist_path.write_text(json.dumps(data), encoding="utf-8")
+        ids = array("q", self._old_users)
+        ids.extend(self._newcomer_ts.keys())
+        seen = array("d", bytes(8 * len(self._old_users)))
+        seen.extend(self._newcomer_ts.values())
+        if sys.byteorder == "big":
+            ids.byteswap()
+            seen.byteswap()
+        tmp_path = self.persist_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            ids.tofile(f)
+            seen.tofile(f)
+        os.replace(tmp_path, self.persist_path)
+        self._dirty = False
+
+    async def periodic_save(self, stop_event: asyncio.Event, interval: float = 60.0) -> None:
+        """Save every `interval` seconds until stop_event is set."""
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                self.save()
+            except Exception as e:
+                logger.warning(f"Failed to save newcomer data: {e}")
 
     def _load(self) -> None:
-        """Load persisted state."""
+        """Load persisted state (see save() for the format)."""
+        try:
+            raw = self.persist_path.read_bytes()
+            count = len(raw) // 16
+            ids = array("q")
+            ids.frombytes(raw[:8 * count])
+            seen = array("d")
+            seen.frombytes(raw[8 * count:16 * count])
+            if sys.byteorder == "big":
+                ids.byteswap()
+                seen.byteswap()
+            self._set_users(zip(ids, seen))
+            logger.info(f"Loaded {self.known_user_count} users from {self.persist_path}")
+        except Exception as e:
+            logger.warning(f"Failed to load newcomer data: {e}")
+
+    def _load_legacy_json(self, path: Path) -> None:
+        """Import state saved by older versions as JSON; rewritten on next save."""
         try:
-            data = json.loads(self.persist_path.read_text(encoding="utf-8"))
-            self._users = {int(k): v for k, v in data.items()}
-            logger.info(f"Loaded {len(self._users)} users from {self.persist_path}")
+            data = jsonutil.loads(path.read_bytes())
+            self._set_users((int(k), v) for k, v in data.items())
+            self._dirty = True
+            logger.info(f"Imported {self.known_user_count} users from {path}")
         except Exception as e:
             logger.warning(f"Failed to load newcomer data: {e}")
 
     @property
     def known_user_count(self) -> int:
-        return len(self._users)
+        return len(self._old_users) + len(self._newcomer_ts)
@@ -8,13 +8,13 @@ accounting for unplanned newcomer spending.
 
 from __future__ import annotations
 
-import json
 import logging
 import time
-from datetime import datetime, timezone
 from pathlib import Path
 from typing import Optional
 
+from src import jsonutil
+
 logger = logging.getLogger(__name__)
 
 
@@ -38,28 +38,25 @@ class QuotaManager:
 
         if self.persist_path and self.persist_path.exists():
             self._load()
-        
+
         # Immediate reset if loaded data is from a previous day
+        self._next_reset_ts = self._day_start + 86400.0
         self._maybe_reset()
 
     @staticmethod
     def _current_day_start() -> float:
-        """Timestamp of midnight UTC today."""
-        now = datetime.now(timezone.utc)
-        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        return midnight.timestamp()
+        """Timestamp of midnight UTC today (Unix time has no leap seconds)."""
+        now = time.time()
+        return now - now % 86400.0
 
-    @staticmethod
-    def _seconds_until_midnight() -> float:
+    def _seconds_until_midnight(self) -> float:
         """Seconds remaining until next midnight UTC."""
-        now = datetime.now(timezone.utc)
-        tomorrow = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        from datetime import timedelta
-        tomorrow += timedelta(days=1)
-        return (tomorrow - now).total_seconds()
+        return self._next_reset_ts - time.time()
 
     def _maybe_reset(self) -> None:
         """Reset counters if a new day has started."""
+        if time.time() < self._next_reset_ts:
+            return
         current_day = self._current_day_start()
         if current_day > self._day_start:
             logger.info(
@@ -71,6 +68,7 @@ class QuotaManager:
             self.requests_used = 0
             self.newcomer_requests = 0
             # We don't save immediately on reset, it will save on next record or shutdown
+        self._next_reset_ts = self._day_start + 86400.0
 
     @property
     def remaining_requests(self) -> int:
@@ -119,6 +117,16 @@ class QuotaManager:
         self.newcomer_requests += 1
         self.save()
 
+    def seconds_until_next_batch(self) -> float:
+        """
+        How long the flush loop should sleep before its next check.
+
+        The time left until next_batch_time(); once that has passed (the
+        queue was empty when it came due), a full interval.
+        """
+        delay = self.next_batch_time() - time.time()
+        return delay if delay > 0 else self.interval_seconds
+
     def can_send_now(self) -> bool:
         """Whether enough time has passed since last batch."""
         return time.time() >= self.next_batch_time()
@@ -135,14 +143,14 @@ class QuotaManager:
                 "newcomer_requests": self.newcomer_requests,
                 "last_batch_time": self._last_batch_time,
             }
-            self.persist_path.write_text(json.dumps(data), encoding="utf-8")
+            self.persist_path.write_bytes(jsonutil.dumps(data))
         except Exception as e:
             logger.warning(f"Failed to save quota data: {e}")
 
     def _load(self) -> None:
         """Load persisted state."""
         try:
-            data = json.loads(self.persist_path.read_text(encoding="utf-8"))
+            data = jsonutil.loads(self.persist_path.read_bytes())
             self._day_start = data.get("day_start", self._day_start)
             self.requests_used = data.get("requests_used", 0)
             self.newcomer_requests = data.get("newcomer_requests", 0)
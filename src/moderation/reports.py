@@ -1,9 +1,11 @@
+import heapq
 import logging
 import time
 from collections import Counter
 from datetime import datetime, timedelta
+from operator import itemgetter
 from typing import Dict, List, Optional
-from src.moderation.reputation import UserReputation
+from src.moderation.reputation import STRIKE_WINDOWS, UserReputation
 
 logger = logging.getLogger(__name__)
 
@@ -34,16 +36,12 @@ class ReportGenerator:
         verdicts = self.stats["verdicts"]
         
         # Find top flagged users
-        flagged_users = []
-        for uid, user_stats in self.reputation.users.items():
-            if user_stats.strikes:
-                recent_strikes = [s for s in user_stats.strikes if time.time() - s.timestamp < (86400 if daily else 604800)]
-                if recent_strikes:
-                    flagged_users.append((uid, len(recent_strikes), recent_strikes))
-        
-        flagged_users.sort(key=lambda x: x[1], reverse=True)
+        window = STRIKE_WINDOWS[0] if daily else STRIKE_WINDOWS[1]
+        counts = self.reputation.recent_strike_counts(window)
         top_users_str = ""
-        for i, (uid, count, strikes) in enumerate(flagged_users[:5]):
+        cutoff = time.time() - window
+        for i, (uid, count) in enumerate(heapq.nlargest(5, counts.items(), key=itemgetter(1))):
+            strikes = [s for s in self.reputation.users[uid].strikes if s.timestamp > cutoff]
             rule_summary = Counter(s.rule for s in strikes)
             rules_str = ", ".join(f"{rule} x{c}" for rule, c in rule_summary.items())
             top_users_str += f"  {i+1}. ID: {uid} — {count} strikes ({rules_str})\n"
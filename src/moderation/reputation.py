@@ -1,30 +1,58 @@
-import json
+import asyncio
 import logging
+import os
+import sys
 import time
-from collections import defaultdict
-from dataclasses import dataclass, asdict
+from collections import defaultdict, deque
+from dataclasses import dataclass, asdict, field
 from pathlib import Path
 from typing import Dict, List, Optional
 
+from src import jsonutil
+
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Report windows (seconds) for which recent strikes are counted per user
+STRIKE_WINDOWS = (86400, 604800)
+
+# Seconds between snapshot rewrites (which also empty the change log)
+AUTOSAVE_INTERVAL = 30.0
+
+@dataclass(slots=True, frozen=True)
 class Strike:
     timestamp: float
     rule: str
     reason: str
     message_excerpt: str
 
-@dataclass
+    @classmethod
+    def from_dict(cls, data: dict) -> "Strike":
+        # Rules come from a small fixed set: share one string per rule
+        return cls(
+            timestamp=data["timestamp"],
+            rule=sys.intern(data["rule"]),
+            reason=data["reason"],
+            message_excerpt=data["message_excerpt"],
+        )
+
+@dataclass(slots=True)
 class UserStats:
     user_id: int
     first_seen: float
     message_count: int = 0
-    strikes: List[Strike] = None
+    strikes: List[Strike] = field(default_factory=list)
+    # Cached result of UserReputation.get_tier, valid until the timestamp
+    # (not persisted)
+    tier: str = "newcomer"
+    tier_valid_until: float = 0.0
 
-    def __post_init__(self):
-        if self.strikes is None:
-            self.strikes = []
+    def to_dict(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "first_seen": self.first_seen,
+            "message_count": self.message_count,
+            "strikes": [asdict(s) for s in self.strikes],
+        }
 
 class UserReputation:
     """
@@ -39,75 +67,197 @@ class UserReputation:
         self.persist_path = Path(persist_path)
         self.trusted_min_days = trusted_min_days
         self.trusted_min_messages = trusted_min_messages
+        self._trusted_min_age = trusted_min_days * 86400.0
         self.users: Dict[int, UserStats] = {}
+        # Append-only log of changes since the last snapshot, one JSON per line
+        self._wal_path = self.persist_path.with_suffix(".wal")
+        self._wal = None
+        self._wal_pending = 0
+        # Per window: (timestamp, user_id) of strikes inside it, oldest first,
+        # and how many of them each user has — kept current as strikes come in
+        self._strike_log: Dict[int, deque] = {w: deque() for w in STRIKE_WINDOWS}
+        self._recent_strikes: Dict[int, Dict[int, int]] = {w: {} for w in STRIKE_WINDOWS}
         self.load()
 
     def load(self):
-        if not self.persist_path.exists():
-            return
-        try:
-            with open(self.persist_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+        if self.persist_path.exists():
+            try:
+                data = jsonutil.loads(self.persist_path.read_bytes())
                 for uid_str, udata in data.items():
                     uid = int(uid_str)
-                    strikes = [Strike(**s) for s in udata.get("strikes", [])]
+                    strikes = [Strike.from_dict(s) for s in udata.get("strikes", [])]
                     self.users[uid] = UserStats(
                         user_id=uid,
                         first_seen=udata["first_seen"],
                         message_count=udata.get("message_count", 0),
                         strikes=strikes,
                     )
-            logger.info(f"Loaded reputation data for {len(self.users)} users")
+                logger.info(f"Loaded reputation data for {len(self.users)} users")
+            except Exception as e:
+                logger.error(f"Failed to load reputation data: {e}")
+        self._replay_wal()
+
+        now = time.time()
+        for ts, uid in sorted(
+            (strike.timestamp, uid)
+            for uid, stats in self.users.items()
+            for strike in stats.strikes
+            if now - strike.timestamp < STRIKE_WINDOWS[-1]
+        ):
+            self._track_strike(uid, ts)
+        self.expire_strikes(now)
+
+    def _replay_wal(self):
+        """Apply changes logged after the last snapshot."""
+        if not self._wal_path.exists():
+            return
+        replayed = 0
+        try:
+            with open(self._wal_path, "rb") as f:
+                for line in f:
+                    try:
+                        record = jsonutil.loads(line)
+                    except jsonutil.JSONDecodeError:
+                        continue  # torn write from a crash
+                    if record.get("op") == "act":
+                        self._stats(record["uid"], record["ts"]).message_count += 1
+                    elif record.get("op") == "strike":
+                        strike = Strike.from_dict(record["strike"])
+                        self._stats(record["uid"], strike.timestamp).strikes.append(strike)
+                    replayed += 1
         except Exception as e:
-            logger.error(f"Failed to load reputation data: {e}")
+            logger.error(f"Failed to replay reputation log: {e}")
+        self._wal_pending = replayed
+        if replayed:
+            logger.info(f"Replayed {replayed} reputation changes from {self._wal_path}")
 
     def save(self):
+        """Write a full snapshot and empty the change log."""
         try:
             self.persist_path.parent.mkdir(parents=True, exist_ok=True)
-            data = {str(uid): asdict(stats) for uid, stats in self.users.items()}
-            with open(self.persist_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            data = {str(uid): stats.to_dict() for uid, stats in self.users.items()}
+            # Compact, and swapped in atomically so a crash never leaves a
+            # half-written snapshot next to a log that's about to be dropped
+            tmp_path = self.persist_path.with_suffix(".tmp")
+            tmp_path.write_bytes(jsonutil.dumps(data))
+            os.replace(tmp_path, self.persist_path)
         except Exception as e:
             logger.error(f"Failed to save reputation data: {e}")
+            return
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
+        self._wal_path.unlink(missing_ok=True)
+        self._wal_pending = 0
+
+    async def autosave(self, stop_event: asyncio.Event, interval: float = AUTOSAVE_INTERVAL):
+        """
+        Compact the change log into the snapshot every `interval` seconds
+        while there are changes, until stop_event is set.
 
-    def update_activity(self, user_id: int):
+        The snapshot is written on the event loop on purpose: it must not
+        interleave with log appends, or changes logged mid-write would be
+        dropped with the log.
+        """
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._wal_pending:
+                self.save()
+
+    def _log(self, record: dict):
+        """Append one change to the log (compacted later by autosave/save)."""
+        try:
+            if self._wal is None:
+                self._wal_path.parent.mkdir(parents=True, exist_ok=True)
+                # Unbuffered: each change reaches the OS in a single write
+                self._wal = open(self._wal_path, "ab", buffering=0)
+            self._wal.write(jsonutil.dumps(record) + b"\n")
+        except Exception as e:
+            logger.error(f"Failed to log reputation change: {e}")
+            return
+        self._wal_pending += 1
+
+    def _stats(self, user_id: int, first_seen: float) -> UserStats:
+        stats = self.users.get(user_id)
+        if stats is None:
+            stats = self.users[user_id] = UserStats(user_id=user_id, first_seen=first_seen)
+        return stats
+
+    def update_activity(self, user_id: int, now: Optional[float] = None):
         """Update message count and first-seen timestamp."""
-        if user_id not in self.users:
-            self.users[user_id] = UserStats(user_id=user_id, first_seen=time.time())
-        
-        self.users[user_id].message_count += 1
-        # Save periodically or on every message if volume is low
-        self.save()
+        if now is None:
+            now = time.time()
+        stats = self._stats(user_id, now)
+        stats.message_count += 1
+        if stats.message_count == self.trusted_min_messages:
+            stats.tier_valid_until = 0.0  # may now qualify as trusted
+        self._log({"op": "act", "uid": user_id, "ts": now})
 
     def add_strike(self, user_id: int, rule: str, reason: str, message_text: str):
         """Record a violation strike for a user."""
-        if user_id not in self.users:
-            self.users[user_id] = UserStats(user_id=user_id, first_seen=time.time())
-        
+        stats = self._stats(user_id, time.time())
         strike = Strike(
             timestamp=time.time(),
-            rule=rule,
+            rule=sys.intern(rule),
             reason=reason,
             message_excerpt=message_text[:100] + ("..." if len(message_text) > 100 else ""),
         )
-        self.users[user_id].strikes.append(strike)
-        logger.info(f"Added strike to user {user_id} (Total: {len(self.users[user_id].strikes)})")
-        self.save()
+        stats.strikes.append(strike)
+        self._track_strike(user_id, strike.timestamp)
+        logger.info(f"Added strike to user {user_id} (Total: {len(stats.strikes)})")
+        self._log({"op": "strike", "uid": user_id, "strike": asdict(strike)})
+
+    def _track_strike(self, user_id: int, timestamp: float):
+        for window in STRIKE_WINDOWS:
+            self._strike_log[window].append((timestamp, user_id))
+            counts = self._recent_strikes[window]
+            counts[user_id] = counts.get(user_id, 0) + 1
+
+    def expire_strikes(self, now: Optional[float] = None):
+        """Drop strikes that have aged out of each window."""
+        now = time.time() if now is None else now
+        for window in STRIKE_WINDOWS:
+            log = self._strike_log[window]
+            counts = self._recent_strikes[window]
+            while log and now - log[0][0] >= window:
+                _, uid = log.popleft()
+                if counts[uid] <= 1:
+                    del counts[uid]
+                else:
+                    counts[uid] -= 1
+
+    def recent_strike_counts(self, window: int) -> Dict[int, int]:
+        """{user_id: strikes in the last `window` seconds} (one of STRIKE_WINDOWS)."""
+        self.expire_strikes()
+        return self._recent_strikes[window]
 
     def get_tier(self, user_id: int) -> str:
         """Determine the trust tier of a user."""
-        if user_id not in self.users:
+        stats = self.users.get(user_id)
+        if stats is None:
             return "newcomer"
-        
-        stats = self.users[user_id]
-        days_since_first_seen = (time.time() - stats.first_seen) / 86400
-
-        if days_since_first_seen >= self.trusted_min_days and stats.message_count >= self.trusted_min_messages:
-            return "trusted"
-        elif days_since_first_seen >= 1: # More than 24h
-            return "regular"
+
+        now = time.time()
+        if now < stats.tier_valid_until:
+            return stats.tier
+
+        # Tiers only move up: cache until the next age threshold. Crossing
+        # the message threshold is handled in update_activity.
+        age = now - stats.first_seen
+        if age >= self._trusted_min_age and stats.message_count >= self.trusted_min_messages:
+            stats.tier, stats.tier_valid_until = "trusted", float("inf")
+        elif age >= 86400:  # More than 24h
+            stats.tier = "regular"
+            stats.tier_valid_until = (
+                stats.first_seen + self._trusted_min_age
+                if age < self._trusted_min_age else float("inf")
+            )
         else:
-            return "newcomer"
+            stats.tier, stats.tier_valid_until = "newcomer", stats.first_seen + 86400
+        return stats.tier
 
     def is_trusted(self, user_id: int) -> bool:
         return self.get_tier(user_id) == "trusted"
@@ -8,8 +8,10 @@ quota usage, batch timing, and last moderation action.
 from __future__ import annotations
 
 import logging
+import os
 import time
 from datetime import datetime, timezone
+from pathlib import Path
 from typing import Optional
 
 from telethon import TelegramClient
@@ -29,8 +31,9 @@ class StatusReporter:
     """
     Manages a self-updating status message in the review group.
 
-    On startup, searches recent messages for an existing status message
-    (by marker text) and reuses it. Otherwise sends a new one.
+    On startup, reuses the status message remembered from the last run,
+    or searches recent messages for one (by marker text). Otherwise sends
+    a new one.
     Always edits in-place to avoid message spam.
     """
 
@@ -38,24 +41,33 @@ class StatusReporter:
         self,
         client: TelegramClient,
         review_group,
+        state_path: Optional[str] = "data/status_message.id",
     ):
         self.client = client
         self.review_group = review_group
+        # Remembers the status message ID across restarts
+        self._state_path = Path(state_path) if state_path else None
         self._message_id: Optional[int] = None
         self._last_ban_time: Optional[float] = None
         self._last_batch_time: Optional[float] = None
         self._last_update_time: float = 0.0
+        self._last_text: Optional[str] = None  # last text sent or edited in
         self._initialized = False
         self._force_update = False
 
     async def initialize(self) -> None:
         """
-        Search recent messages in the review group for an existing
-        status message so we can edit it instead of sending a new one.
+        Find an existing status message in the review group so we can
+        edit it instead of sending a new one: first the one remembered
+        from the last run, otherwise by searching recent messages.
         """
         if self._initialized:
             return
 
+        if await self._restore_message_id():
+            self._initialized = True
+            return
+
         try:
             me = await self.client.get_me()
             async for msg in self.client.iter_messages(
@@ -66,6 +78,7 @@ class StatusReporter:
                 text = msg.raw_text or msg.message or ""
                 if STATUS_MARKER_SEARCH in text and msg.sender_id == me.id:
                     self._message_id = msg.id
+                    self._remember_message_id()
                     logger.info(
                         f"Found existing status message (id={msg.id}), "
                         "will edit it in-place"
@@ -76,6 +89,37 @@ class StatusReporter:
 
         self._initialized = True
 
+    async def _restore_message_id(self) -> bool:
+        """Reuse the status message ID saved by a previous run, if it still exists."""
+        if not self._state_path:
+            return False
+        try:
+            message_id = int(self._state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        try:
+            msg = await self.client.get_messages(self.review_group, ids=message_id)
+        except Exception as e:
+            logger.warning(f"Could not fetch saved status message (id={message_id}): {e}")
+            return False
+        text = (msg.raw_text or msg.message or "") if msg else ""
+        if not (msg and msg.out and STATUS_MARKER_SEARCH in text):
+            return False
+        self._message_id = message_id
+        logger.info(f"Reusing status message (id={message_id}), will edit it in-place")
+        return True
+
+    def _remember_message_id(self) -> None:
+        if not self._state_path or self._message_id is None:
+            return
+        try:
+            self._state_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._state_path.with_suffix(".tmp")
+            tmp_path.write_text(str(self._message_id), encoding="utf-8")
+            os.replace(tmp_path, self._state_path)
+        except OSError as e:
+            logger.warning(f"Could not save status message ID: {e}")
+
     def record_ban(self) -> None:
         self._last_ban_time = time.time()
         self._force_update = True
@@ -136,6 +180,11 @@ class StatusReporter:
         self._force_update = False
         text = self.build_status_text(quota_info, batch_queue_size)
 
+        # Same text as last time: Telegram would only answer "not modified"
+        if self._message_id and text == self._last_text:
+            self._last_update_time = now
+            return
+
         # Try editing existing message
         if self._message_id:
             try:
@@ -144,10 +193,12 @@ class StatusReporter:
                     self._message_id,
                     text,
                 )
+                self._last_text = text
                 self._last_update_time = now
                 return
             except MessageNotModifiedError:
                 # Content hasn't changed — that's fine, skip
+                self._last_text = text
                 self._last_update_time = now
                 return
             except Exception as e:
@@ -158,6 +209,8 @@ class StatusReporter:
         try:
             msg = await self.client.send_message(self.review_group, text)
             self._message_id = msg.id
+            self._last_text = text
+            self._remember_message_id()
             self._last_update_time = now
             logger.info(f"Status message sent (id={msg.id})")
         except Exception as e:
@@ -11,12 +11,15 @@ import logging
 from pathlib import Path
 from typing import Optional, Union
 
+import os
 import sqlite3
 import asyncio
 from telethon import TelegramClient
 from telethon.tl.types import Channel, Chat, User
 from telethon.errors import SessionPasswordNeededError
 
+from src import jsonutil
+
 logger = logging.getLogger(__name__)
 
 
@@ -55,6 +58,30 @@ class TelegramSession:
         self._connected = False
         self._me: Optional[User] = None
 
+        # Group title -> marked peer ID, so restarts skip the dialog scan
+        self._group_cache_path = self.session_dir / "group_cache.json"
+        self._group_cache: dict[str, int] = self._load_group_cache()
+
+    def _load_group_cache(self) -> dict[str, int]:
+        try:
+            data = jsonutil.loads(self._group_cache_path.read_bytes())
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable group cache: {e}")
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return {str(k): int(v) for k, v in data.items() if isinstance(v, int)}
+
+    def _save_group_cache(self) -> None:
+        tmp = self._group_cache_path.with_suffix(".tmp")
+        try:
+            tmp.write_bytes(jsonutil.dumps(self._group_cache))
+            os.replace(tmp, self._group_cache_path)
+        except OSError as e:
+            logger.warning(f"Failed to save group cache: {e}")
+
     @property
     def client(self) -> TelegramClient:
         """Get underlying Telethon client."""
@@ -147,7 +174,23 @@ class TelegramSession:
                     is_username = True
                     group_identifier = group_identifier.lstrip("@")
 
-            # Try searching dialogs by title first
+            # Titles resolved on a previous run map straight to an entity ID
+            if isinstance(group_identifier, str) and not is_username:
+                cached_id = self._group_cache.get(group_identifier)
+                if cached_id is not None:
+                    try:
+                        entity = await self._client.get_entity(cached_id)
+                        if isinstance(entity, (Chat, Channel)):
+                            logger.info(
+                                f"Resolved group from cache: {entity.title} (ID: {entity.id})"
+                            )
+                            return entity
+                    except Exception as e:
+                        logger.debug(f"Cached ID {cached_id} for '{group_identifier}' is stale: {e}")
+                    del self._group_cache[group_identifier]
+                    self._save_group_cache()
+
+            # Try searching dialogs by title
             if isinstance(group_identifier, str) and not is_username:
                 try:
                     async for dialog in self._client.iter_dialogs():
@@ -157,6 +200,10 @@ class TelegramSession:
                             logger.info(
                                 f"Found group by title: {dialog.name} (ID: {dialog.entity.id})"
                             )
+                            # Marked peer ID (-100… for channels); get_entity reads a
+                            # bare positive int as a user ID
+                            self._group_cache[group_identifier] = dialog.id
+                            self._save_group_cache()
                             return dialog.entity
                 except Exception as e:
                     logger.warning(f"Failed to search dialogs by title: {e}")
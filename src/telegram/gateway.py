@@ -3,21 +3,206 @@ Telegram Gateway Module
 
 Registers message event handlers on monitored groups and dispatches
 incoming messages to the moderation engine.
+
+The gateway is event-loop agnostic: main() runs it on uvloop when the
+`speedups` extra is installed (faster queue, callback and socket paths
+for the event fan-in), and on the stock asyncio loop otherwise.
 """
 
 from __future__ import annotations
 
+import asyncio
+import itertools
 import logging
-from typing import Optional, Union
+import re
+import time
+from array import array
+from typing import Iterable, Optional, Union
 
 from telethon import events
 from telethon.tl.types import Channel, Chat
 
 from src.telegram.client import TelegramSession
-from src.moderation.engine import ModerationEngine
+from src.moderation.cache import ProcessedCache
+from src.moderation.engine import EvalResult, ModerationEngine
 
 logger = logging.getLogger(__name__)
 
+_EVAL_SKIPPED = EvalResult("skipped")
+
+# Messages older than this on arrival are catch-up replays, queued behind live ones
+_REPLAY_AGE_SECONDS = 60.0
+
+# Text with nothing to moderate: whitespace and emoji only (pictographs,
+# symbols, dingbats, variation selectors, ZWJ and keycap joiners). Only
+# pictograph blocks are listed: enclosed letters (1F100-1F1FF, incl.
+# regional indicators) spell out words and are a known filter evasion.
+_IGNORE_RE = re.compile(
+    "[\\s\u200d\u20e3\u2190-\u21ff\u2300-\u23ff\u2600-\u27bf"
+    "\u2b00-\u2bff\ufe0f\U0001f300-\U0001f64f\U0001f680-\U0001f6ff"
+    "\U0001f7e0-\U0001f7eb\U0001f900-\U0001faff]*"
+)
+
+# Recent (chat, message) pairs remembered to drop redelivered events
+_SEEN_EVENTS_MAX = 4096
+
+# A traceback is logged at most this often per exception type (seconds)
+_TRACEBACK_SAMPLE_INTERVAL = 60.0
+
+
+class MessageBatcher:
+    """
+    Coalesces incoming messages into small batches for the engine.
+
+    Messages arriving within max_wait_ms of each other (up to
+    max_batch_size) are handed to engine.evaluate_batch together, with
+    at most `max_inflight` messages being evaluated at once.
+    """
+
+    def __init__(
+        self,
+        engine: ModerationEngine,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 100.0,
+        max_inflight: int = 32,
+    ):
+        self.engine = engine
+        # A batch larger than the slot count could never be admitted
+        self.max_batch_size = min(max_batch_size, max_inflight)
+        self.max_wait = max_wait_ms / 1000.0
+        # (priority, seq, item): live messages (0) before catch-up replays (1),
+        # FIFO within a priority
+        self._queue: asyncio.PriorityQueue[
+            tuple[int, int, tuple[object, object, asyncio.Future]]
+        ] = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        # One slot per message under evaluation, shared by all batches
+        self._slots = asyncio.Semaphore(max_inflight)
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set[asyncio.Task] = set()
+        self._tb_sampler: dict[type, float] = {}  # exception type -> last traceback time
+        self.skipped_count = 0
+        self._result_handlers = {
+            "ok": self._handle_ok,
+            "error": self._handle_error,
+            "llm_error": self._handle_llm_error,
+            "skipped": self._handle_skipped,
+        }
+
+    def submit(self, message, chat) -> asyncio.Future:
+        """Queue a message; the returned future resolves once it is evaluated."""
+        fut = asyncio.get_running_loop().create_future()
+        date = getattr(message, "date", None)
+        prio = 1 if date and time.time() - date.timestamp() > _REPLAY_AGE_SECONDS else 0
+        self._queue.put_nowait((prio, next(self._seq), (message, chat, fut)))
+        return fut
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Stop collecting and wait for batches already dispatched.
+
+        Messages still queued are resolved as skipped, not evaluated.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        leftover = []
+        while not self._queue.empty():
+            leftover.append(self._queue.get_nowait()[2])
+        if leftover:
+            self._resolve(leftover, [_EVAL_SKIPPED] * len(leftover))
+
+    async def _run(self) -> None:
+        queue = self._queue
+        while True:
+            batch = [(await queue.get())[2]]
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append((await asyncio.wait_for(queue.get(), remaining))[2])
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                # Already popped from the queue, so stop() won't see these
+                self._resolve(batch, [_EVAL_SKIPPED] * len(batch))
+                raise
+
+            # Backpressure: wait until every message in the batch has a slot
+            acquired = 0
+            try:
+                for _ in batch:
+                    await self._slots.acquire()
+                    acquired += 1
+            except asyncio.CancelledError:
+                for _ in range(acquired):
+                    self._slots.release()
+                self._resolve(batch, [_EVAL_SKIPPED] * len(batch))
+                raise
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _dispatch(self, batch: list[tuple[object, object, asyncio.Future]]) -> None:
+        try:
+            results = await self.engine.evaluate_batch(
+                [(message, chat) for message, chat, _ in batch]
+            )
+        except Exception as e:
+            results = [EvalResult("error", e)] * len(batch)
+        finally:
+            for _ in batch:
+                self._slots.release()
+
+        self._resolve(batch, results)
+
+    def _resolve(self, batch: list[tuple[object, object, asyncio.Future]], results) -> None:
+        handlers = self._result_handlers
+        for (message, _, fut), result in zip(batch, results):
+            handlers.get(result.status, self._handle_unknown)(message, result)
+            if not fut.done():
+                fut.set_result(result)
+
+    def _handle_ok(self, message, result: EvalResult) -> None:
+        pass
+
+    def _handle_skipped(self, message, result: EvalResult) -> None:
+        self.skipped_count += 1
+
+    def _handle_llm_error(self, message, result: EvalResult) -> None:
+        pass  # already logged by the engine, which also feeds its LLM breaker
+
+    def _handle_error(self, message, result: EvalResult) -> None:
+        # Traceback formatting is costly; one per error type a minute is
+        # enough to debug with
+        error = result.error
+        now = time.monotonic()
+        last = self._tb_sampler.get(type(error))
+        sampled = last is None or now - last >= _TRACEBACK_SAMPLE_INTERVAL
+        if sampled:
+            self._tb_sampler[type(error)] = now
+        logger.error(
+            "Moderation error for msg %s: %r", message.id, error,
+            exc_info=error if sampled else None,
+        )
+
+    def _handle_unknown(self, message, result: EvalResult) -> None:
+        logger.warning("Unknown evaluation status '%s' for msg %s", result.status, message.id)
+
 
 class Gateway:
     """
@@ -32,62 +217,128 @@ class Gateway:
         session: TelegramSession,
         engine: ModerationEngine,
         monitored_groups: list[Union[Chat, Channel]],
+        skip_sender_ids: Iterable[int] = (),
     ):
         self.session = session
         self.engine = engine
-        self.monitored_groups = monitored_groups
-        self._group_ids: set[int] = set()
+        self._set_groups(monitored_groups)
+        self._extra_skip_ids = frozenset(skip_sender_ids)
+        self._skip_senders: frozenset[int] = self._extra_skip_ids
+        self._batcher = MessageBatcher(engine)
+        self._submit = self._batcher.submit  # bound once for the hot path
+        self._seen = ProcessedCache(max_size=_SEEN_EVENTS_MAX)
+        self._handler = None  # generated in start(), see _build_handler
 
-    async def start(self) -> None:
-        """Register event handlers and start listening."""
-        
-        # Calculate every possible integer ID variation for our monitored groups
-        self._allowed_ids = set()
-        for g in self.monitored_groups:
-            self._allowed_ids.add(g.id)
-            self._allowed_ids.add(-g.id)
+    def _set_groups(self, groups: list[Union[Chat, Channel]]) -> None:
+        """Precompute the chat filter and group labels for `groups`."""
+        # Parallel arrays: dense IDs and their titles, no per-group object walk
+        ids = array("q", (g.id for g in groups))
+        titles = [getattr(g, "title", str(g.id)) for g in groups]
+
+        # Every possible integer ID variation for our monitored groups, mapped
+        # to the resolved entity so the handler never has to look the chat up
+        chat_by_id: dict[int, Union[Chat, Channel]] = {}
+        for gid, g in zip(ids, groups):
+            chat_by_id[gid] = g
+            chat_by_id[-gid] = g
             try:
-                self._allowed_ids.add(int(f"-100{g.id}"))
+                chat_by_id[int(f"-100{gid}")] = g
             except ValueError:
                 pass
 
-        group_names = [getattr(g, "title", str(g.id)) for g in self.monitored_groups]
-        logger.info(f"Monitoring groups: {', '.join(group_names)}")
-        logger.info(f"Allowed chat IDs: {self._allowed_ids}")
+        self._ids = ids
+        self._titles = titles
+        self._chat_by_id = chat_by_id
+        self._group_names_str = ", ".join(titles)
 
-        client = self.session.client
+    async def start(self) -> None:
+        """Register event handlers and start listening."""
+        logger.info("Monitoring groups: %s", self._group_names_str)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Allowed chat IDs: %s", sorted(self._chat_by_id))
 
-        # Listen to EVERYTHING, filter manually to avoid Telethon matching bugs
-        @client.on(events.NewMessage())
-        async def on_new_message(event: events.NewMessage.Event):
-            """Handle every new message in monitored groups."""
-            message = event.message
-            chat_id = getattr(event.chat, 'id', getattr(message, 'chat_id', 0))
-
-            # Skip messages from self
-            me = self.session.me
-            if me and message.sender_id == me.id:
-                return
-
-            # Skip empty messages (media-only, service messages)
-            if not message.text:
-                return
-
-            # Manual chat filter
-            if chat_id not in self._allowed_ids:
-                # Uncomment to debug ALL private messages/unmonitored groups
-                # logger.debug(f"Ignored message from {chat_id}")
-                return
+        # Senders dropped before anything else is read: our own account plus
+        # configured bots. Resolved once, here, and baked into the handler;
+        # the account cannot change while connected, even across reconnects.
+        me = self.session.me
+        if me is None and self.session.is_connected:
+            me = await self.session.client.get_me()
+        if me:
+            self._skip_senders = self._extra_skip_ids | {me.id}
 
-            try:
-                await self.engine.evaluate(message, event.chat)
-            except Exception as e:
-                logger.error(
-                    f"Moderation error for msg {message.id}: {e}", exc_info=True
-                )
+        self._batcher.start()
+        self._install_handler()
 
         logger.info("Gateway started — listening for messages.")
 
+    def _build_handler(self):
+        """
+        Generate the NewMessage handler specialized for the current config.
+
+        The sender skip-list and the group map are fixed once start()
+        runs, so they are baked in: a single skipped sender becomes an
+        integer compare, an empty skip-list drops the check, and every
+        collaborator is a plain global instead of an attribute load.
+        """
+        lines = [
+            "async def on_new_message(event):",
+            # Manual chat filter, first: most traffic on a busy account is
+            # from chats we don't monitor. event.chat_id comes straight from
+            # the peer, and the entity was resolved at startup, so event.chat
+            # (and a possible get_entity RPC) is never touched.
+            "    chat = chat_by_id_get(event.chat_id)",
+            "    if chat is None:",
+            "        return",
+            "    message = event.message",
+        ]
+        # Skip messages from self and ignored bots
+        if len(self._skip_senders) == 1:
+            (only,) = self._skip_senders
+            lines += [f"    if message.sender_id == {int(only)!r}:", "        return"]
+        elif self._skip_senders:
+            lines += ["    if message.sender_id in skip_senders:", "        return"]
+        lines += [
+            # Skip empty messages (media-only, service messages). The raw
+            # .message is checked because .text re-renders the entities.
+            "    text = message.message",
+            "    if not text:",
+            "        return",
+            # Reconnects can redeliver an update; don't batch it twice
+            "    if seen(event.chat_id, message.id):",
+            "        return",
+            # Emoji-only messages skip the LLM route, but still count as
+            # activity for reputation and newcomer tracking. Ones that hit a
+            # hard-ban rule (emoji keywords/regexes) go through the engine.
+            "    if ignore_match(text) and not prefilter_check(text):",
+            "        record_activity(message)",
+            "        return",
+            "    submit(message, chat)",
+        ]
+        namespace = {
+            "chat_by_id_get": self._chat_by_id.get,
+            "skip_senders": self._skip_senders,
+            "ignore_match": _IGNORE_RE.fullmatch,
+            "seen": self._seen.check_and_mark,
+            "submit": self._submit,
+            "record_activity": self.engine.record_activity,
+            "prefilter_check": self.engine.pre_filter.check,
+        }
+        exec(compile("\n".join(lines), "<gateway-handler>", "exec"), namespace)
+        return namespace["on_new_message"]
+
+    def _install_handler(self) -> None:
+        """Register a freshly generated handler, replacing any earlier one."""
+        client = self.session.client
+        if self._handler is not None:
+            client.remove_event_handler(self._handler)
+        self._handler = self._build_handler()
+        # Listen to EVERYTHING, filter manually to avoid Telethon matching bugs
+        client.add_event_handler(self._handler, events.NewMessage())
+
+    async def stop(self) -> None:
+        """Stop batching and wait for in-flight evaluations."""
+        await self._batcher.stop()
+
     async def run_until_disconnected(self) -> None:
         """Block until the Telegram client disconnects."""
         await self.session.client.run_until_disconnected()